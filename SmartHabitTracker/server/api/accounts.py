@@ -0,0 +1,100 @@
+"""
+Account creation and lookup by email.
+
+Logins are by email, which django.contrib.auth neither indexes nor keeps
+unique. UserProfile.email_key holds the lowercased address under a unique
+index instead, so:
+
+* find_by_email() is one indexed query that also brings back the profile
+  and the token;
+* a second account for an address (in any letter case) fails on the index
+  inside create_account(), with no pre-check query on the happy path.
+
+A post_save hook keeps the key in step when User.email changes elsewhere
+(profile PATCH, admin) and gives users created outside create_account()
+(createsuperuser, create_user) their profile; if their address is already
+taken, that profile's key stays NULL.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import UserProfile
+
+
+def email_key(email):
+    return (email or "").strip().lower() or None
+
+
+def email_taken(email, exclude_user=None):
+    key = email_key(email)
+    if key is None:
+        return False
+    profiles = UserProfile.objects.filter(email_key=key)
+    if exclude_user is not None:
+        profiles = profiles.exclude(user=exclude_user)
+    return profiles.exists()
+
+
+def find_by_email(email):
+    """The user registered under `email` (any case), profile and token joined in, or None."""
+    key = email_key(email)
+    if key is None:
+        return None
+    profile = (
+        UserProfile.objects.select_related("user", "user__auth_token")
+        .filter(email_key=key).first()
+    )
+    return profile.user if profile else None
+
+
+def token_for(user):
+    """The user's token, reusing one loaded by find_by_email()."""
+    try:
+        return user.auth_token
+    except Token.DoesNotExist:
+        return Token.objects.create(user=user)
+
+
+# ==========================================================
+# CREATION
+# ==========================================================
+def create_account(username, email, password_hash, first_name=""):
+    """
+    User, profile and token as three INSERTs in one transaction.
+    `password_hash` is already encoded (make_password), so callers can hash
+    outside the transaction or in bulk. Raises IntegrityError for a taken
+    username or email.
+    """
+    email = User.objects.normalize_email(email or "")
+    user = User(
+        username=User.normalize_username(username), email=email,
+        password=password_hash, first_name=first_name,
+    )
+    user._profile_pending = True  # created right below, with its key
+    with transaction.atomic():
+        user.save()
+        UserProfile.objects.create(user=user, email_key=email_key(email))
+        token = Token.objects.create(user=user)
+    return user, token
+
+
+@receiver(post_save, sender=User)
+def sync_email_key(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or getattr(instance, "_profile_pending", False):
+        return
+    if created:
+        try:
+            with transaction.atomic():
+                UserProfile.objects.get_or_create(user=instance, defaults={"email_key": email_key(instance.email)})
+        except IntegrityError:
+            # create_user() with an address another account holds: the user
+            # still gets a profile, just not a login by that email
+            UserProfile.objects.get_or_create(user=instance)
+        return
+    if update_fields is not None and "email" not in update_fields:
+        return  # e.g. last_login
+    key = email_key(instance.email)
+    UserProfile.objects.filter(user_id=instance.pk).exclude(email_key=key).update(email_key=key)
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Habit, HabitCompletion, Reminder, UserProfile
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.models import User
+from .deletion import schedule_habit_deletion, schedule_user_deletion
+from .models import (
+    CompletionArchive, DailyRollup, DeletionJob, Habit, HabitCompletion, Notification, Reminder,
+    UserProfile,
+)
 
 
 @admin.register(Habit)
@@ -9,6 +15,28 @@ class HabitAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description', 'user__username']
     ordering = ['-created_at']
 
+    # deleting here schedules a background purge instead of a cascade
+    def delete_model(self, request, obj):
+        schedule_habit_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for habit in queryset:
+            schedule_habit_deletion(habit)
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    # deleting here locks the account and schedules a background purge instead of a cascade
+    def delete_model(self, request, obj):
+        schedule_user_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            schedule_user_deletion(user)
+
 
 @admin.register(HabitCompletion)
 class HabitCompletionAdmin(admin.ModelAdmin):
@@ -18,6 +46,15 @@ class HabitCompletionAdmin(admin.ModelAdmin):
     ordering = ['-date']
 
 
+@admin.register(CompletionArchive)
+class CompletionArchiveAdmin(admin.ModelAdmin):
+    list_display = ['habit', 'year', 'count', 'archived_at']
+    list_filter = ['year']
+    search_fields = ['habit__name']
+    exclude = ['bitmap']
+    ordering = ['-year']
+
+
 @admin.register(Reminder)
 class ReminderAdmin(admin.ModelAdmin):
     list_display = ['habit', 'user', 'time', 'days', 'is_active', 'created_at']
@@ -31,3 +68,30 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'timezone', 'notifications_enabled', 'created_at']
     list_filter = ['notifications_enabled', 'created_at']
     search_fields = ['user__username', 'user__email']
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'completed', 'active_habits']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    ordering = ['-date']
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'kind', 'object_id', 'label', 'status', 'rows_deleted', 'attempts', 'next_attempt_at', 'created_at', 'finished_at',
+    ]
+    list_filter = ['kind', 'status']
+    search_fields = ['label']
+    ordering = ['-created_at']
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'channel', 'destination', 'due_at', 'status', 'attempts', 'sent_at']
+    list_filter = ['channel', 'status']
+    search_fields = ['user__username', 'destination']
+    raw_id_fields = ['user', 'reminder']
+    ordering = ['-due_at']
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        # connects the post_save hook that keeps UserProfile.email_key in step
+        from . import accounts  # noqa: F401
@@ -0,0 +1,220 @@
+"""
+Cold tier for old completion history.
+
+Whole years older than settings.COMPLETION_HOT_DAYS are moved out of
+HabitCompletion into CompletionArchive: one row per habit-year holding a
+366-bit bitmap (bit n == day n of the year, Jan 1 = 0) and a count.
+Habit.archived_until marks where a habit's archive ends, so readers only
+query the archive for habits that have one.
+
+Readers go through completion_dates(); toggle_completion() writes into the
+archive when the day lies in an archived year.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CompletionArchive, Habit, HabitCompletion
+
+ARCHIVE_BYTES = 46  # ceil(366 / 8)
+
+
+# ==========================================================
+# BITMAPS
+# ==========================================================
+def _day_index(day):
+    return (day - date(day.year, 1, 1)).days
+
+
+def pack_year(dates, year):
+    bits = 0
+    for day in dates:
+        if day.year == year:
+            bits |= 1 << _day_index(day)
+    return bits.to_bytes(ARCHIVE_BYTES, "little")
+
+
+def unpack_year(bitmap, year):
+    """Completed dates in `year`, oldest first."""
+    bits = int.from_bytes(bytes(bitmap), "little")
+    jan1 = date(year, 1, 1)
+    days = []
+    while bits:
+        low = bits & -bits
+        days.append(jan1 + timedelta(days=low.bit_length() - 1))
+        bits ^= low
+    return days
+
+
+def hot_cutoff(today=None):
+    """First day kept in the hot tier: Jan 1 of the year COMPLETION_HOT_DAYS ago."""
+    today = today or timezone.now().date()
+    return date((today - timedelta(days=settings.COMPLETION_HOT_DAYS)).year, 1, 1)
+
+
+# ==========================================================
+# READS (both tiers)
+# ==========================================================
+def completion_dates(habits, start=None, end=None):
+    """{habit_id: [dates]} across the hot and archive tiers, optionally within [start, end]."""
+    habits = list(habits)
+    dates = defaultdict(list)
+
+    hot = HabitCompletion.objects.filter(habit__in=habits)
+    if start:
+        hot = hot.filter(date__gte=start)
+    if end:
+        hot = hot.filter(date__lte=end)
+    for habit_id, day in hot.values_list("habit_id", "date").iterator():
+        dates[habit_id].append(day)
+
+    # only habits with an archive overlapping the range cost a second query
+    cold_ids = [
+        h.id for h in habits
+        if h.archived_until and (start is None or start < h.archived_until)
+    ]
+    if not cold_ids:
+        return dates
+
+    cold = CompletionArchive.objects.filter(habit_id__in=cold_ids)
+    if start:
+        cold = cold.filter(year__gte=start.year)
+    if end:
+        cold = cold.filter(year__lte=end.year)
+
+    cold_dates = defaultdict(list)
+    for habit_id, year, bitmap in cold.values_list("habit_id", "year", "bitmap"):
+        cold_dates[habit_id].extend(
+            d for d in unpack_year(bitmap, year)
+            if (not start or d >= start) and (not end or d <= end)
+        )
+
+    for habit_id, days in cold_dates.items():
+        # a day toggled in while its year was being archived can sit in both tiers
+        seen = set(dates[habit_id])
+        dates[habit_id].extend(d for d in days if d not in seen)
+
+    return dates
+
+
+# ==========================================================
+# WRITES INTO AN ARCHIVED YEAR
+# ==========================================================
+def set_archived(habit, day, completed=None):
+    """
+    Flip `day` in its archive row, or set it to `completed` when given.
+    Returns (action, delta) with delta 0 for a no-op, or None if the year is not archived.
+    """
+    if not habit.archived_until or day >= habit.archived_until:
+        return None
+
+    with transaction.atomic():
+        row = CompletionArchive.objects.select_for_update().filter(habit_id=habit.id, year=day.year).first()
+        if row is None:
+            return None
+
+        bits = int.from_bytes(bytes(row.bitmap), "little")
+        bit = 1 << _day_index(day)
+        # a day can sit in both tiers (a hot row written while the year was being archived)
+        hot = HabitCompletion.objects.filter(habit_id=habit.id, date=day)
+        in_hot = hot.exists()
+        done = bool(bits & bit) or in_hot
+        if completed is None:
+            completed = not done
+        if completed == done:
+            return ("completed" if done else "uncompleted"), 0
+
+        if not completed and in_hot:
+            hot.delete()
+        if completed or bits & bit:
+            row.bitmap = (bits ^ bit).to_bytes(ARCHIVE_BYTES, "little")
+            row.count += 1 if completed else -1
+            row.save(update_fields=["bitmap", "count", "archived_at"])
+
+    return ("completed", 1) if completed else ("uncompleted", -1)
+
+
+# ==========================================================
+# ARCHIVE / REHYDRATE
+# ==========================================================
+def archive_habits(habit_ids, cutoff):
+    """
+    Move completions before `cutoff` (a Jan 1) for `habit_ids` into the
+    archive, merging with existing archive rows. Returns rows moved.
+    """
+    with transaction.atomic():
+        # lock the hot rows so a concurrent toggle can't delete one mid-move
+        rows = list(
+            HabitCompletion.objects.select_for_update()
+            .filter(habit_id__in=habit_ids, date__lt=cutoff)
+            .values_list("id", "habit_id", "date")
+        )
+        if not rows:
+            return 0
+
+        by_year = defaultdict(list)
+        for _, habit_id, day in rows:
+            by_year[(habit_id, day.year)].append(day)
+
+        existing = {
+            (a.habit_id, a.year): a
+            for a in CompletionArchive.objects.select_for_update().filter(
+                habit_id__in={h for h, _ in by_year}, year__lt=cutoff.year,
+            )
+        }
+
+        now = timezone.now()
+        created, updated = [], []
+        for (habit_id, year), days in by_year.items():
+            bits = int.from_bytes(pack_year(days, year), "little")
+            row = existing.get((habit_id, year))
+            if row is None:
+                row = CompletionArchive(habit_id=habit_id, year=year)
+                created.append(row)
+            else:
+                bits |= int.from_bytes(bytes(row.bitmap), "little")
+                updated.append(row)
+            row.bitmap = bits.to_bytes(ARCHIVE_BYTES, "little")
+            row.count = bin(bits).count("1")
+            row.archived_at = now
+
+        CompletionArchive.objects.bulk_create(created)
+        CompletionArchive.objects.bulk_update(updated, ["bitmap", "count", "archived_at"])
+
+        ids = [row_id for row_id, _, _ in rows]
+        for start in range(0, len(ids), 1000):
+            HabitCompletion.objects.filter(id__in=ids[start:start + 1000]).delete()
+
+        Habit.all_objects.filter(
+            Q(archived_until__isnull=True) | Q(archived_until__lt=cutoff),
+            id__in={h for h, _ in by_year},
+        ).update(archived_until=cutoff)
+
+    return len(rows)
+
+
+def rehydrate(archives):
+    """Turn archive rows back into HabitCompletion rows. Returns rows restored."""
+    restored = 0
+    habit_ids = set()
+    for archive in archives:
+        days = unpack_year(archive.bitmap, archive.year)
+        with transaction.atomic():
+            HabitCompletion.objects.bulk_create(
+                [HabitCompletion(habit_id=archive.habit_id, date=day) for day in days],
+                batch_size=500, ignore_conflicts=True,
+            )
+            archive.delete()
+        restored += len(days)
+        habit_ids.add(archive.habit_id)
+
+    # habits left with no archive rows go back to hot-only reads
+    still_archived = set(
+        CompletionArchive.objects.filter(habit_id__in=habit_ids).values_list("habit_id", flat=True)
+    )
+    Habit.all_objects.filter(id__in=habit_ids - still_archived).update(archived_until=None)
+    return restored
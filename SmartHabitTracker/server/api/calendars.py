@@ -0,0 +1,77 @@
+"""
+Calendar / heatmap data as packed bitsets.
+
+A habit-year is the same 366-bit layout the archive tier uses (bit n == day
+n of the year, Jan 1 = 0, little-endian bytes), plus completions per month.
+Each habit-year is cached in the "calendars" cache under
+calendar_cache_key(), which includes Habit.updated_at: every toggle that
+changes a day ends in refresh_streak(), which bumps it, so a toggle moves
+the habit to fresh keys in every worker and process without deleting
+anything. Misses are filled with one range
+query over both completion tiers for all missing habits at once.
+"""
+import base64
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .archive import completion_dates, pack_year
+
+ENCODINGS = ("bytes", "base64")
+
+
+def calendar_cache_key(habit, year):
+    version = int(habit.updated_at.timestamp() * 1_000_000)
+    return f"habit-cal:{habit.id}:{year}:{version}"
+
+
+def _month_counts(bitmap, year):
+    bits = int.from_bytes(bitmap, "little")
+    counts = []
+    for month in range(1, 13):
+        first = (date(year, month, 1) - date(year, 1, 1)).days
+        last = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)) - date(year, 1, 1)
+        counts.append(bin((bits >> first) & ((1 << (last.days - first)) - 1)).count("1"))
+    return counts
+
+
+def habit_years(habits, year):
+    """{habit_id: (bitmap bytes, [12 month counts])} for `year`, cached per habit-year."""
+    habits = list(habits)
+    cache = caches["calendars"]
+    keys = {h.id: calendar_cache_key(h, year) for h in habits}
+    cached = cache.get_many(keys.values())
+
+    result = {}
+    missing = []
+    for habit in habits:
+        hit = cached.get(keys[habit.id])
+        if hit is None:
+            missing.append(habit)
+        else:
+            result[habit.id] = hit
+
+    if missing:
+        dates = completion_dates(missing, start=date(year, 1, 1), end=date(year, 12, 31))
+        fresh = {}
+        for habit in missing:
+            bitmap = pack_year(dates[habit.id], year)
+            fresh[keys[habit.id]] = result[habit.id] = (bitmap, _month_counts(bitmap, year))
+        cache.set_many(fresh, settings.CALENDAR_CACHE_SECONDS)
+
+    return result
+
+
+def encode(bitmap, encoding):
+    if encoding == "base64":
+        return base64.b64encode(bitmap).decode()
+    return list(bitmap)
+
+
+def day_counts(bitmaps, year):
+    """Completions per day of `year` summed over several habit bitmaps."""
+    length = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    ints = [int.from_bytes(b, "little") for b in bitmaps]
+    return [sum((bits >> n) & 1 for bits in ints) for n in range(length)]
+
@@ -0,0 +1,148 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import (
+    CompletionArchive, DailyRollup, DeletionJob, Habit, HabitCompletion, Notification, Reminder,
+)
+from .archive import unpack_year
+from .rollups import refresh_active_habits, remove_completions
+
+
+# ==========================================================
+# SCHEDULING (request path: O(1) rows touched per habit)
+# ==========================================================
+def schedule_habit_deletion(habit):
+    """Hide `habit` now and queue its history for purge_deletions."""
+    with transaction.atomic():
+        Habit.all_objects.filter(pk=habit.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+        # a handful of rows per habit, and they must stop firing right away
+        Reminder.objects.filter(habit_id=habit.pk).delete()
+        job, _ = DeletionJob.objects.get_or_create(
+            kind="habit", object_id=habit.pk, defaults={"label": habit.name[:200]},
+        )
+        # today's total drops now; older rows are corrected as the job purges them
+        refresh_active_habits(habit.user_id, timezone.now().date())
+    return job
+
+
+def schedule_user_deletion(user):
+    """Lock the account out now and queue everything it owns for purge_deletions."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user_id=user.pk).delete()
+        Habit.all_objects.filter(user_id=user.pk, deleted_at__isnull=True).update(deleted_at=timezone.now())
+        job, _ = DeletionJob.objects.get_or_create(
+            kind="user", object_id=user.pk, defaults={"label": user.username[:200]},
+        )
+    return job
+
+
+# ==========================================================
+# PURGING (worker: bounded batches, progress after each)
+# ==========================================================
+def _progress(job, deleted):
+    DeletionJob.objects.filter(pk=job.pk).update(
+        rows_deleted=F("rows_deleted") + deleted, heartbeat_at=timezone.now(),
+    )
+
+
+def _delete_in_batches(job, queryset, batch_size, pause):
+    """Delete `queryset` batch_size rows at a time, each batch its own transaction."""
+    model = queryset.model
+    total = 0
+    while True:
+        ids = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return total
+        # no signals on these models and cascades are fast deletes, so this is plain DELETE ... WHERE id IN
+        deleted, _ = model._base_manager.filter(pk__in=ids).delete()
+        total += deleted
+        _progress(job, deleted)
+        if pause:
+            time.sleep(pause)
+
+
+def _purge_history(job, habit, batch_size, pause):
+    """
+    Delete a hidden habit's completions and archive rows, taking each batch
+    out of the owner's rollups in the same transaction. Only the days the
+    habit touched are rewritten, never the user's whole history.
+    """
+    completions = HabitCompletion.objects.filter(habit_id=habit.pk)
+    while True:
+        with transaction.atomic():
+            batch = list(completions.select_for_update().order_by().values_list("pk", "date")[:batch_size])
+            if not batch:
+                break
+            deleted, _ = HabitCompletion.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+            remove_completions(habit, [day for _, day in batch])
+        _progress(job, deleted)
+        if pause:
+            time.sleep(pause)
+
+    # one row per habit-year, at most 366 days each
+    for pk in CompletionArchive.objects.filter(habit_id=habit.pk).values_list("pk", flat=True):
+        with transaction.atomic():
+            row = CompletionArchive.objects.select_for_update().filter(pk=pk).first()
+            if row is None:
+                continue
+            row.delete()
+            remove_completions(habit, unpack_year(row.bitmap, row.year))
+        _progress(job, 1)
+        if pause:
+            time.sleep(pause)
+
+    # the habit no longer counts as active on any day since it was created
+    refresh_active_habits(habit.user_id, habit.created_at.date(), batch_size)
+
+
+def _purge_habit(job, habit_id, batch_size, pause):
+    _delete_in_batches(job, HabitCompletion.objects.filter(habit_id=habit_id), batch_size, pause)
+    _delete_in_batches(job, CompletionArchive.objects.filter(habit_id=habit_id), batch_size, pause)
+    _delete_in_batches(job, Reminder.objects.filter(habit_id=habit_id), batch_size, pause)
+    # nothing left to cascade to, so this is one small delete
+    deleted, _ = Habit.all_objects.filter(pk=habit_id, deleted_at__isnull=False).delete()
+    DeletionJob.objects.filter(pk=job.pk).update(rows_deleted=F("rows_deleted") + deleted)
+
+
+def purge(job, batch_size=1000, pause=0.0):
+    """Run one claimed DeletionJob to completion."""
+    if job.kind == "habit":
+        habit = Habit.all_objects.filter(pk=job.object_id, deleted_at__isnull=False).first()
+        if habit is not None:
+            # rollups skip hidden habits, so its days come out as its rows go
+            _purge_history(job, habit, batch_size, pause)
+        _purge_habit(job, job.object_id, batch_size, pause)
+        return
+
+    habit_ids = list(Habit.all_objects.filter(user_id=job.object_id).values_list("id", flat=True))
+    for habit_id in habit_ids:
+        _purge_habit(job, habit_id, batch_size, pause)
+    _delete_in_batches(job, Notification.objects.filter(user_id=job.object_id), batch_size, pause)
+    _delete_in_batches(job, Reminder.objects.filter(user_id=job.object_id), batch_size, pause)
+    _delete_in_batches(job, DailyRollup.objects.filter(user_id=job.object_id), batch_size, pause)
+
+    # profile, token and auth rows are all that remain
+    deleted, _ = User.objects.filter(pk=job.object_id, is_active=False).delete()
+    DeletionJob.objects.filter(pk=job.pk).update(rows_deleted=F("rows_deleted") + deleted)
+
+
+def claim(job):
+    """Mark `job` running unless another worker got there first."""
+    now = timezone.now()
+    return DeletionJob.objects.filter(pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at).update(
+        status="running", started_at=now, heartbeat_at=now, attempts=F("attempts") + 1,
+    ) == 1
+
+
+def retry_delay(attempts, base_seconds):
+    """Delay before retrying a job that failed `attempts` times: doubling, with jitter."""
+    delay = base_seconds * 2 ** (attempts - 1)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
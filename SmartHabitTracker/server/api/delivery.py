@@ -0,0 +1,222 @@
+"""
+Asyncio delivery of claimed notifications. No ORM in here.
+
+deliver() takes plain dicts (id, channel, destination, message, due_at) and
+returns {id: None if sent, else a DeliveryError}. Sends are batched per
+channel:
+
+* email: up to NOTIFY_BATCH_SIZE messages share one SMTP session;
+* webhook: notifications for the same URL go out as one JSON POST of up to
+  NOTIFY_BATCH_SIZE items.
+
+Every destination (the SMTP relay, each webhook host) has its own semaphore
+of NOTIFY_MAX_PER_DESTINATION, so a slow receiver never has more than that
+many open connections from one worker while the other destinations carry
+on. smtplib blocks, so SMTP sessions run in threads; webhooks use a minimal
+HTTP/1.1 client on asyncio streams.
+
+Webhook URLs come from users, so a webhook host must resolve to public
+addresses only: loopback, private, link-local and other reserved ranges
+are refused, both when the URL is saved (check_webhook_url) and again
+right before each POST, which then connects to the address it checked.
+NOTIFY_ALLOW_PRIVATE_WEBHOOKS lifts this for local testing.
+"""
+import asyncio
+import ipaddress
+import json
+import smtplib
+import socket
+import ssl
+from collections import defaultdict
+from email.message import EmailMessage
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+SUBJECT = "Habit reminder"
+USER_AGENT = "SmartHabitTracker-notify/1.0"
+
+
+class DeliveryError(Exception):
+    """A failed send. Permanent ones (rejected address, 4xx) are not retried."""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ==========================================================
+# EMAIL (SMTP)
+# ==========================================================
+def _email(item):
+    msg = EmailMessage()
+    msg["From"] = settings.DEFAULT_FROM_EMAIL
+    msg["To"] = item["destination"]
+    msg["Subject"] = SUBJECT
+    msg.set_content(item["message"])
+    return msg
+
+
+def _smtp_error(code, text):
+    if isinstance(text, bytes):
+        text = text.decode(errors="replace")
+    return DeliveryError(f"SMTP {code} {text}", permanent=500 <= code < 600)
+
+
+def _send_emails(batch):
+    """Send `batch` over one SMTP session (blocking, runs in a thread)."""
+    results = {}
+    try:
+        with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT,
+                          timeout=settings.NOTIFY_TIMEOUT_SECONDS) as smtp:
+            if settings.EMAIL_USE_TLS:
+                smtp.starttls(context=ssl.create_default_context())
+            if settings.EMAIL_HOST_USER:
+                smtp.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+            for item in batch:
+                # smtplib resets the transaction itself after a refusal, so the session goes on
+                try:
+                    smtp.send_message(_email(item))
+                    results[item["id"]] = None
+                except smtplib.SMTPRecipientsRefused as exc:
+                    results[item["id"]] = _smtp_error(*next(iter(exc.recipients.values())))
+                except smtplib.SMTPResponseException as exc:
+                    results[item["id"]] = _smtp_error(exc.smtp_code, exc.smtp_error)
+    except (smtplib.SMTPException, OSError) as exc:
+        # the session broke: whatever was not sent yet is retried
+        error = DeliveryError(f"SMTP session failed: {exc!r}")
+        for item in batch:
+            results.setdefault(item["id"], error)
+    return results
+
+
+async def _email_batch(batch):
+    return await asyncio.to_thread(_send_emails, batch)
+
+
+# ==========================================================
+# WEBHOOK (HTTP POST)
+# ==========================================================
+def _origin(url):
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    return parts.hostname or "", parts.port or (443 if secure else 80), secure
+
+
+def _public_address(host, infos):
+    """The first address from getaddrinfo() `infos`; DeliveryError if any of them is not public."""
+    addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+    if not addresses:
+        raise DeliveryError(f"{host} has no address", permanent=True)
+    if not settings.NOTIFY_ALLOW_PRIVATE_WEBHOOKS:
+        for address in addresses:
+            if not address.is_global or address.is_multicast:
+                raise DeliveryError(f"{host} resolves to non-public address {address}", permanent=True)
+    return str(addresses[0])
+
+
+def check_webhook_url(url):
+    """Raise DeliveryError unless the host of `url` resolves to public addresses only."""
+    host, port, _ = _origin(url)
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as exc:
+        raise DeliveryError(f"cannot resolve {host}: {exc}")
+    _public_address(host, infos)
+
+
+async def _post(url, payload):
+    """POST `payload` as JSON and return the response status code."""
+    host, port, secure = _origin(url)
+    # re-checked on every send: DNS may have changed since the URL was saved
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    address = _public_address(host, infos)
+    parts = urlsplit(url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    body = json.dumps(payload).encode()
+    head = (
+        f"POST {target} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode()
+
+    reader, writer = await asyncio.open_connection(
+        address, port,
+        ssl=ssl.create_default_context() if secure else None,
+        server_hostname=host if secure else None,
+    )
+    try:
+        writer.write(head + body)
+        await writer.drain()
+        status_line = await reader.readline()
+    finally:
+        writer.close()
+    try:
+        return int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise DeliveryError(f"bad HTTP response {status_line[:80]!r}")
+
+
+async def _webhook_batch(batch):
+    url = batch[0]["destination"]
+    payload = {
+        "notifications": [
+            {"id": item["id"], "message": item["message"], "due_at": item["due_at"]} for item in batch
+        ]
+    }
+    try:
+        code = await asyncio.wait_for(_post(url, payload), settings.NOTIFY_TIMEOUT_SECONDS)
+    except DeliveryError as exc:
+        error = exc
+    except (OSError, asyncio.TimeoutError) as exc:
+        error = DeliveryError(f"POST failed: {exc!r}")
+    else:
+        if 200 <= code < 300:
+            return dict.fromkeys((item["id"] for item in batch), None)
+        # 429 and 5xx are the receiver's problem right now; other 4xx won't get better
+        error = DeliveryError(f"HTTP {code}", permanent=code < 500 and code != 429)
+    return dict.fromkeys((item["id"] for item in batch), error)
+
+
+# ==========================================================
+# FAN-OUT
+# ==========================================================
+async def deliver(items):
+    """Send `items`, batched per channel and capped per destination."""
+    size = settings.NOTIFY_BATCH_SIZE
+    limits = defaultdict(lambda: asyncio.Semaphore(settings.NOTIFY_MAX_PER_DESTINATION))
+    results = {}
+
+    async def run(destination, send, batch):
+        async with limits[destination]:
+            try:
+                results.update(await send(batch))
+            except Exception as exc:  # never lose the rest of the cycle to one batch
+                error = DeliveryError(f"unexpected error: {exc!r}")
+                results.update(dict.fromkeys((item["id"] for item in batch), error))
+
+    emails = []
+    webhooks = defaultdict(list)
+    for item in items:
+        if item["channel"] == "email":
+            emails.append(item)
+        elif item["channel"] == "webhook":
+            webhooks[item["destination"]].append(item)
+        else:
+            results[item["id"]] = DeliveryError(f"unknown channel {item['channel']!r}", permanent=True)
+
+    relay = ("smtp", settings.EMAIL_HOST, settings.EMAIL_PORT)
+    sends = [run(relay, _email_batch, batch) for batch in _chunks(emails, size)]
+    for url, group in webhooks.items():
+        sends += [run(_origin(url), _webhook_batch, batch) for batch in _chunks(group, size)]
+
+    await asyncio.gather(*sends)
+    return results
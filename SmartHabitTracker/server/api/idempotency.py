@@ -0,0 +1,99 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+A client that may retry (mobile apps on flaky networks) sends the same
+`Idempotency-Key` header on every attempt. The first attempt runs the view
+and its response is cached for settings.IDEMPOTENCY_TTL_SECONDS, keyed by
+user and key. Repeats get the cached response back, marked with an
+`Idempotent-Replayed: true` header, without touching the database again.
+
+* Reusing a key with a different request (path or body) returns 422.
+* A repeat that arrives while the first attempt is still running returns
+  409, so the client retries later instead of running the write twice.
+* 5xx responses are not cached, so the client can retry them.
+
+Keys and in-flight locks live in the "idempotency" cache, which
+settings.CACHES shares between workers (Redis, or a database cache table
+of its own, so stored responses are never culled to make room for other
+entries), so a retry that lands on another process still sees the first
+attempt. cache.add() is atomic on both backends, so only one attempt takes
+the lock; the stored response is checked again once it is held, since the
+first attempt may have finished between the two.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+IN_FLIGHT_SECONDS = 30
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str) if request.data else ""
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return Response(
+            {"error": f"{HEADER} was already used for a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored["data"], status=stored["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """Decorator for DRF view methods / actions that take (self, request, ...)."""
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} is too long"}, status=status.HTTP_400_BAD_REQUEST)
+
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        cache_key = f"idem:{request.user.pk}:{digest}"
+        fingerprint = _fingerprint(request)
+
+        cache = caches["idempotency"]
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        lock_key = f"{cache_key}:lock"
+        if not cache.add(lock_key, 1, IN_FLIGHT_SECONDS):
+            return Response(
+                {"error": "A request with this Idempotency-Key is still in progress"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        try:
+            # the first attempt may have stored its response and released the
+            # lock between our get() and add()
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = view(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(
+                    cache_key,
+                    {"fingerprint": fingerprint, "status": response.status_code, "data": response.data},
+                    settings.IDEMPOTENCY_TTL_SECONDS,
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.archive import archive_habits, hot_cutoff
+from api.models import HabitCompletion
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completions from years older than COMPLETION_HOT_DAYS into the "
+        "per-habit-per-year bitmap archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="Habits per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would move.")
+
+    def handle(self, *args, **options):
+        cutoff = hot_cutoff()
+        started = time.perf_counter()
+
+        candidates = (
+            HabitCompletion.objects.filter(date__lt=cutoff)
+            .values("habit_id")
+            .annotate(n=Count("id"))
+            .order_by("habit_id")
+        )
+        pending = {row["habit_id"]: row["n"] for row in candidates}
+        self.stdout.write(
+            f"{sum(pending.values())} completion(s) before {cutoff} across {len(pending)} habit(s)"
+        )
+        if options["dry_run"] or not pending:
+            return
+
+        habit_ids = list(pending)
+        moved = 0
+        for start in range(0, len(habit_ids), options["batch_size"]):
+            moved += archive_habits(habit_ids[start:start + options["batch_size"]], cutoff)
+            self.stdout.write(
+                f"  {min(start + options['batch_size'], len(habit_ids))}/{len(habit_ids)} habits, "
+                f"{moved} row(s) moved ({time.perf_counter() - started:.1f}s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} completion(s) before {cutoff}."))
@@ -0,0 +1,270 @@
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import DeletionJob, Habit, HabitCompletion, Reminder
+from api.tracking import toggle_completion
+from .seed_load_data import SEED_PASSWORD
+
+
+SCRATCH_NAME = "bench scratch"
+
+
+class Case:
+    def __init__(self, url_name, method, path, data=None, setup=None, as_user=None):
+        self.url_name = url_name
+        self.method = method
+        self.path = path        # str, or callable(state) -> str
+        self.data = data        # dict, or callable(state) -> dict
+        self.setup = setup      # callable() -> state, run untimed before each call
+        self.as_user = as_user  # callable(state) -> User to authenticate as instead
+
+    @property
+    def label(self):
+        return f"{self.method} {self.url_name}"
+
+    def prepare(self):
+        state = self.setup() if self.setup else None
+        path = self.path(state) if callable(self.path) else self.path
+        data = self.data(state) if callable(self.data) else self.data
+        user = self.as_user(state) if self.as_user else None
+        return path, data, user
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every endpoint in api/urls.py: latency, query count and peak "
+        "memory per call. Writes a JSON report that can be compared between runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to benchmark as (default: heaviest 'load-' user).")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed calls per endpoint.")
+        parser.add_argument("--out", default="bench_endpoints.json")
+        parser.add_argument("--compare", help="Previous report to diff against.")
+        parser.add_argument("--only", action="append", default=[],
+                            help="Only run cases whose label contains this text (repeatable).")
+
+    def handle(self, *args, **options):
+        user = self._pick_user(options["user"])
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        cases = self._cases(user)
+        if options["only"]:
+            cases = [c for c in cases if any(text in c.label for text in options["only"])]
+
+        self._warn_uncovered(cases)
+
+        results = {}
+        try:
+            for case in cases:
+                results[case.label] = self._run(client, case, options["repeat"])
+                r = results[case.label]
+                self.stdout.write(
+                    f"{case.label:<34} p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                    f"{r['queries']:4d} queries  {r['peak_kb']:8.1f}KB  [{r['status']}]"
+                )
+        finally:
+            self._cleanup(user)
+
+        report = {
+            "meta": {
+                "timestamp": timezone.now().isoformat(),
+                "db_vendor": connection.vendor,
+                "user": user.username,
+                "habits": user.habits.count(),
+                "completions": HabitCompletion.objects.filter(habit__user=user).count(),
+                "repeat": options["repeat"],
+            },
+            "endpoints": results,
+        }
+        with open(options["out"], "w") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['out']}"))
+
+        if options["compare"]:
+            self._compare(options["compare"], report)
+
+    # ---------- setup ----------
+    def _pick_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user '{username}'")
+
+        user = (
+            User.objects.filter(username__startswith="load-")
+            .annotate(n=Count("habits__completions"))
+            .order_by("-n")
+            .first()
+        )
+        if user is None:
+            raise CommandError("No seeded users; run `manage.py seed_load_data` first or pass --user.")
+        return user
+
+    def _cases(self, user):
+        habit = user.habits.order_by("-total_completions").first()
+        reminder = Reminder.objects.filter(user=user).first()
+        if habit is None or reminder is None:
+            raise CommandError(f"User '{user.username}' needs at least one habit and one reminder.")
+
+        # remember what the flip endpoints touch so _cleanup can put it back
+        toggle_day = timezone.now().date() - timedelta(days=400)  # far from "now" so streaks stay put
+        self.restore = {
+            "habit": habit,
+            "toggle_day": toggle_day,
+            "was_completed": habit.completions.filter(date=toggle_day).exists(),
+            "reminder": reminder,
+            "reminder_active": reminder.is_active,
+        }
+        # accounts the register/logout/profile-DELETE cases create; only these are removed again
+        self.created_usernames = []
+
+        def new_habit():
+            return Habit.objects.create(user=user, name=SCRATCH_NAME)
+
+        def scratch_username():
+            name = f"bench-{uuid.uuid4().hex[:10]}"
+            self.created_usernames.append(name)
+            return name
+
+        def new_user():
+            u = User.objects.create_user(username=scratch_username(), password=SEED_PASSWORD)
+            Token.objects.get_or_create(user=u)
+            return u
+
+        def register_payload(_):
+            name = scratch_username()
+            return {"username": name, "email": f"{name}@example.com",
+                    "password": SEED_PASSWORD, "password2": SEED_PASSWORD, "name": "Bench"}
+
+        detail = reverse("habit-detail", args=[habit.id])
+        reminder_detail = reverse("reminder-detail", args=[reminder.id])
+
+        return [
+            Case("api-root", "GET", reverse("api-root")),
+            Case("habit-list", "GET", reverse("habit-list")),
+            Case("habit-list", "POST", reverse("habit-list"), {"name": SCRATCH_NAME, "category": "health"}),
+            Case("habit-detail", "GET", detail),
+            Case("habit-detail", "PATCH", detail, {"notes": habit.notes}),
+            Case("habit-detail", "DELETE", lambda h: reverse("habit-detail", args=[h.id]), setup=new_habit),
+            Case("habit-toggle-completion", "POST", reverse("habit-toggle-completion", args=[habit.id]),
+                 {"date": str(toggle_day)}),
+            Case("habit-completions", "GET", reverse("habit-completions")),
+            Case("habit-calendar", "GET", reverse("habit-calendar", args=[habit.id])),
+            Case("heatmap", "GET", reverse("heatmap")),
+            Case("reminder-list", "GET", reverse("reminder-list")),
+            Case("reminder-list", "POST", reverse("reminder-list"), {"time": "07:30", "message": SCRATCH_NAME}),
+            Case("reminder-detail", "GET", reminder_detail),
+            Case("reminder-detail", "PATCH", reminder_detail, {"message": reminder.message}),
+            Case("reminder-toggle", "POST", reverse("reminder-toggle", args=[reminder.id])),
+            Case("register", "POST", reverse("register"), register_payload),
+            Case("login", "POST", reverse("login"), {"email": user.email, "password": SEED_PASSWORD}),
+            Case("logout", "POST", reverse("logout"), setup=new_user, as_user=lambda u: u),
+            Case("profile", "GET", reverse("profile")),
+            Case("profile", "PATCH", reverse("profile"), {"name": user.first_name}),
+            Case("profile", "DELETE", reverse("profile"), setup=new_user, as_user=lambda u: u),
+            Case("ai-root", "GET", reverse("ai-root")),
+            Case("ai-suggestions", "GET", reverse("ai-suggestions")),
+            Case("stats-weekly", "GET", reverse("stats-weekly")),
+            Case("stats-monthly", "GET", reverse("stats-monthly")),
+            Case("stats-yearly", "GET", reverse("stats-yearly")),
+            Case("db-pool", "GET", reverse("db-pool")),
+        ]
+
+    def _cleanup(self, user):
+        # DELETE cases only schedule a purge, so drop their jobs and rows directly
+        scratch_habits = Habit.all_objects.filter(user=user, name=SCRATCH_NAME)
+        DeletionJob.objects.filter(kind="habit", object_id__in=list(scratch_habits.values_list("id", flat=True))).delete()
+        scratch_habits.delete()
+        Reminder.objects.filter(user=user, message=SCRATCH_NAME).delete()
+
+        names = self.created_usernames
+        for start in range(0, len(names), 1000):
+            bench_users = User.objects.filter(username__in=names[start:start + 1000])
+            DeletionJob.objects.filter(kind="user", object_id__in=list(bench_users.values_list("id", flat=True))).delete()
+            bench_users.delete()
+
+        r = self.restore
+        if r["habit"].completions.filter(date=r["toggle_day"]).exists() != r["was_completed"]:
+            toggle_completion(r["habit"], r["toggle_day"])
+        Reminder.objects.filter(pk=r["reminder"].pk).update(is_active=r["reminder_active"])
+
+    def _warn_uncovered(self, cases):
+        covered = {c.url_name for c in cases}
+        names = {key for key in get_resolver("api.urls").reverse_dict if isinstance(key, str)}
+        missing = sorted(names - covered)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Endpoints without a benchmark case: {', '.join(missing)}"))
+
+    # ---------- measuring ----------
+    def _call(self, client, case):
+        path, data, as_user = case.prepare()
+        if as_user is not None:
+            client = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Token {as_user.auth_token.key}")
+
+        method = getattr(client, case.method.lower())
+        started = time.perf_counter()
+        if data is None:
+            response = method(path)
+        else:
+            response = method(path, json.dumps(data), content_type="application/json")
+        return time.perf_counter() - started, response.status_code
+
+    def _run(self, client, case, repeat):
+        self._call(client, case)  # warm caches and imports
+
+        timings = []
+        for _ in range(repeat):
+            elapsed, status = self._call(client, case)
+            timings.append(elapsed * 1000)
+
+        # CaptureQueriesContext would be reset by request_started, so count at the cursor
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            self._call(client, case)
+
+        tracemalloc.start()
+        self._call(client, case)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        return {
+            "status": status,
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": len(queries),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def _compare(self, path, report):
+        with open(path) as fh:
+            previous = json.load(fh)["endpoints"]
+
+        self.stdout.write(f"\n{'endpoint':<34}{'p50':>10}{'Δp50':>9}{'queries':>9}{'Δq':>6}{'Δpeak KB':>10}")
+        for label, now in report["endpoints"].items():
+            before = previous.get(label)
+            if before is None:
+                self.stdout.write(f"{label:<34}{now['p50_ms']:>10.2f}   (new)")
+                continue
+            change = (now["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+            self.stdout.write(
+                f"{label:<34}{now['p50_ms']:>10.2f}{change:>+8.0f}%{now['queries']:>9d}"
+                f"{now['queries'] - before['queries']:>+6d}{now['peak_kb'] - before['peak_kb']:>+10.1f}"
+            )
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api import notify
+from api.models import Notification, Reminder, UserProfile
+
+ZONES = ["UTC", "Europe/Berlin", "America/New_York", "Asia/Kolkata"]
+
+
+# ==========================================================
+# LOCAL SINKS (SMTP debugging server + HTTP webhook receiver)
+# ==========================================================
+class Sink:
+    """Counts what arrives and how many connections were open at once."""
+
+    def __init__(self, fail_rate, rng):
+        self.fail_rate = fail_rate
+        self.rng = rng
+        self.received = 0
+        self.rejected = 0
+        self.connections = 0
+        self.open = 0
+        self.max_open = 0
+        self.port = None
+
+    def opened(self):
+        self.connections += 1
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+
+    def fails(self):
+        return self.rng.random() < self.fail_rate
+
+
+class SmtpSink(Sink):
+    async def handle(self, reader, writer):
+        self.opened()
+        try:
+            writer.write(b"220 localhost sink ESMTP\r\n")
+            while line := await reader.readline():
+                verb = line[:4].upper()
+                if verb in (b"EHLO", b"HELO"):
+                    reply = b"250 localhost\r\n"
+                elif verb == b"DATA":
+                    writer.write(b"354 go ahead\r\n")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    if self.fails():
+                        self.rejected += 1
+                        reply = b"451 try again later\r\n"
+                    else:
+                        self.received += 1
+                        reply = b"250 queued\r\n"
+                elif verb == b"QUIT":
+                    writer.write(b"221 bye\r\n")
+                    break
+                elif verb in (b"MAIL", b"RCPT", b"RSET", b"NOOP"):
+                    reply = b"250 ok\r\n"
+                else:
+                    reply = b"502 not implemented\r\n"
+                writer.write(reply)
+                await writer.drain()
+        finally:
+            self.open -= 1
+            writer.close()
+
+
+class HttpSink(Sink):
+    async def handle(self, reader, writer):
+        self.opened()
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                int(line.split(b":", 1)[1]) for line in head.split(b"\r\n")
+                if line.lower().startswith(b"content-length:")
+            )
+            batch = json.loads(await reader.readexactly(length))["notifications"]
+            if self.fails():
+                self.rejected += len(batch)
+                writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            else:
+                self.received += len(batch)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+        finally:
+            self.open -= 1
+            writer.close()
+
+
+class SinkServer:
+    """Runs the sinks on an event loop in a background thread."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def _start(self):
+        for sink in self.sinks:
+            server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+            sink.port = server.sockets[0].getsockname()[1]
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+# ==========================================================
+# COMMAND
+# ==========================================================
+class Command(BaseCommand):
+    help = (
+        "Benchmark reminder delivery offline: scratch users and reminders due now, a local "
+        "SMTP sink and HTTP webhook sinks, then enqueue + deliver and report throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000, help="Notifications to deliver.")
+        parser.add_argument("--users", type=int, default=500, help="Scratch users (half email, half webhook).")
+        parser.add_argument("--webhook-hosts", type=int, default=2, help="Separate HTTP sinks (destinations).")
+        parser.add_argument("--fail-rate", type=float, default=0.0,
+                            help="Share of sends the sinks reject with a temporary error.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Notifications claimed per round.")
+        parser.add_argument("--notify-batch", type=int, help="Override NOTIFY_BATCH_SIZE.")
+        parser.add_argument("--per-destination", type=int, help="Override NOTIFY_MAX_PER_DESTINATION.")
+        parser.add_argument("--prefix", default="notifybench")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users with prefix '{prefix}-' already exist; pick another --prefix.")
+        if options["count"] < options["users"]:
+            raise CommandError("--count must be at least --users.")
+
+        rng = random.Random(options["seed"])
+        smtp = SmtpSink(options["fail_rate"], rng)
+        hooks = [HttpSink(options["fail_rate"], rng) for _ in range(options["webhook_hosts"])]
+
+        with SinkServer([smtp, *hooks]):
+            overrides = {
+                "EMAIL_HOST": "127.0.0.1", "EMAIL_PORT": smtp.port, "EMAIL_USE_TLS": False,
+                "EMAIL_HOST_USER": "", "NOTIFY_BACKOFF_SECONDS": 0,
+                # the webhook sinks listen on 127.0.0.1
+                "NOTIFY_ALLOW_PRIVATE_WEBHOOKS": True,
+            }
+            if options["notify_batch"]:
+                overrides["NOTIFY_BATCH_SIZE"] = options["notify_batch"]
+            if options["per_destination"]:
+                overrides["NOTIFY_MAX_PER_DESTINATION"] = options["per_destination"]
+
+            try:
+                with override_settings(**overrides):
+                    self._seed(options, hooks)
+                    self._run(options, smtp, hooks)
+            finally:
+                User.objects.filter(username__startswith=f"{prefix}-").delete()
+
+    def _seed(self, options, hooks):
+        prefix, users = options["prefix"], options["users"]
+        started = time.perf_counter()
+        User.objects.bulk_create([
+            User(username=f"{prefix}-{n}", email=f"{prefix}-{n}@example.com" if n % 2 == 0 else "")
+            for n in range(users)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=f"{prefix}-").order_by("id").values_list("id", flat=True)
+        )
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user_id=uid, timezone=ZONES[n % len(ZONES)],
+                webhook_url="" if n % 2 == 0 else
+                f"http://127.0.0.1:{hooks[n // 2 % len(hooks)].port}/hooks/{uid}" if hooks else "",
+            )
+            for n, uid in enumerate(user_ids)
+        ])
+
+        # every reminder fired a couple of minutes ago in its user's time zone
+        due = timezone.now() - timedelta(minutes=2)
+        reminders = []
+        for n in range(options["count"]):
+            uid = user_ids[n % users]
+            local = due.astimezone(ZoneInfo(ZONES[(n % users) % len(ZONES)]))
+            reminders.append(Reminder(
+                user_id=uid, time=(local - timedelta(seconds=n % 60)).time().replace(microsecond=0),
+                message=f"bench reminder {n}",
+            ))
+        Reminder.objects.bulk_create(reminders, batch_size=1000)
+        self.stdout.write(f"seeded {users} users, {len(reminders)} reminders in {time.perf_counter() - started:.1f}s")
+
+    def _run(self, options, smtp, hooks):
+        # scoped to the scratch users so real reminders in this database are left alone
+        scratch = {"user__username__startswith": f"{options['prefix']}-"}
+        rows = Notification.objects.filter(**scratch)
+
+        started = time.perf_counter()
+        notify.enqueue_due(reminders=Reminder.objects.filter(**scratch))
+        enqueue_seconds = time.perf_counter() - started
+        queued = rows.count()
+        self.stdout.write(f"enqueue_due: {queued} notifications in {enqueue_seconds:.2f}s")
+
+        started = time.perf_counter()
+        rounds = 0
+        while True:
+            claimed, counts = notify.send_batch(options["batch_size"], queryset=rows)
+            if not claimed:
+                break
+            rounds += 1
+            self.stdout.write(
+                f"  round {rounds}: {claimed} claimed, {counts['sent']} sent, "
+                f"{counts['retry']} retry, {counts['failed']} failed"
+            )
+        deliver_seconds = time.perf_counter() - started
+
+        by_status = dict(rows.values_list("status").annotate(n=Count("id")))
+        totals = rows.aggregate(total_attempts=Sum("attempts"), max_attempts=Max("attempts"))
+        sent = by_status.get("sent", 0)
+
+        self.stdout.write("")
+        self.stdout.write(f"delivered {sent}/{queued} in {deliver_seconds:.2f}s over {rounds} round(s): "
+                          f"{sent / deliver_seconds:,.0f} notifications/s")
+        self.stdout.write(f"status: {by_status}, attempts: {totals['total_attempts']} (max {totals['max_attempts']})")
+        self.stdout.write(f"smtp sink: {smtp.received} received, {smtp.rejected} rejected, "
+                          f"{smtp.connections} sessions, max {smtp.max_open} open")
+        for n, sink in enumerate(hooks):
+            self.stdout.write(f"webhook sink {n}: {sink.received} received, {sink.rejected} rejected, "
+                              f"{sink.connections} POSTs, max {sink.max_open} open")
@@ -0,0 +1,182 @@
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from api.accounts import create_account, email_key
+from api.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create users, profiles and tokens from a CSV with columns username, email, "
+        "password (or password_hash) and optional name. Passwords are hashed in a thread "
+        "pool while earlier batches are inserted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users per INSERT batch.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Password hashing threads (PBKDF2 releases the GIL).")
+        parser.add_argument("--validate-passwords", action="store_true",
+                            help="Run AUTH_PASSWORD_VALIDATORS and skip rows that fail.")
+        parser.add_argument("--tokens-out", help="Write username,token for the created users here.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = self._read(options)
+        if not rows:
+            self.stdout.write(self.style.WARNING("Nothing to create."))
+            return
+
+        created = []
+        size = options["batch_size"]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            # map() queues every hash now, so the pool keeps hashing while batches are inserted
+            hashes = pool.map(_password_hash, rows)
+            for start in range(0, len(rows), size):
+                batch = rows[start:start + size]
+                for row in batch:
+                    row["password"] = next(hashes)
+                created += self._insert(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"  {len(created)}/{len(rows)} users ({len(created) / elapsed:.0f}/s)")
+
+        if options["tokens_out"]:
+            with open(options["tokens_out"], "w", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(["username", "token"])
+                writer.writerows(created)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} user(s) in {time.perf_counter() - started:.1f}s."
+        ))
+
+    # ---------- reading + validation ----------
+    def _read(self, options):
+        try:
+            with open(options["csv_path"], newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                if not {"username", "email"} <= set(reader.fieldnames or []):
+                    raise CommandError("CSV needs at least 'username' and 'email' columns.")
+                lines = list(enumerate(reader, start=2))
+        except OSError as exc:
+            raise CommandError(exc)
+
+        rows, usernames, keys = [], set(), set()
+        for line, raw in lines:
+            row = {
+                "username": User.normalize_username((raw.get("username") or "").strip()),
+                "email": User.objects.normalize_email((raw.get("email") or "").strip()),
+                "name": (raw.get("name") or "").strip()[:150],
+                "raw_password": raw.get("password") or "",
+                "password_hash": (raw.get("password_hash") or "").strip(),
+                "line": line,
+            }
+            error = self._check(row, options)
+            key = email_key(row["email"])
+            if not error and row["username"] in usernames:
+                error = "username repeated in file"
+            if not error and key and key in keys:
+                error = "email repeated in file"
+            if error:
+                self.stderr.write(f"line {line}: {error}; skipped")
+                continue
+            usernames.add(row["username"])
+            if key:
+                keys.add(key)
+            rows.append(row)
+
+        return self._drop_existing(rows)
+
+    def _check(self, row, options):
+        try:
+            if not row["username"] or len(row["username"]) > 150:
+                return "username must be 1-150 characters"
+            User.username_validator(row["username"])
+            if row["email"]:
+                validate_email(row["email"])
+            if row["password_hash"]:
+                identify_hasher(row["password_hash"])
+            elif options["validate_passwords"] and row["raw_password"]:
+                candidate = User(username=row["username"], email=row["email"], first_name=row["name"])
+                validate_password(row["raw_password"], user=candidate)
+        except ValidationError as exc:
+            return "; ".join(exc.messages)
+        except ValueError:
+            return "password_hash is not a recognised hash"
+        return None
+
+    def _drop_existing(self, rows):
+        taken_names, taken_keys = set(), set()
+        for start in range(0, len(rows), 1000):
+            chunk = rows[start:start + 1000]
+            taken_names.update(
+                User.objects.filter(username__in=[r["username"] for r in chunk]).values_list("username", flat=True)
+            )
+            taken_keys.update(
+                UserProfile.objects.filter(
+                    email_key__in=[k for k in (email_key(r["email"]) for r in chunk) if k]
+                ).values_list("email_key", flat=True)
+            )
+
+        fresh = []
+        for row in rows:
+            if row["username"] in taken_names:
+                self.stderr.write(f"line {row['line']}: username {row['username']!r} exists; skipped")
+            elif email_key(row["email"]) in taken_keys:
+                self.stderr.write(f"line {row['line']}: email {row['email']!r} exists; skipped")
+            else:
+                fresh.append(row)
+        return fresh
+
+    # ---------- writing ----------
+    def _insert(self, batch):
+        """One transaction: users, then profiles and tokens. Returns [(username, token)]."""
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=r["username"], email=r["email"], first_name=r["name"], password=r["password"])
+                    for r in batch
+                ])
+                # bulk_create does not return ids on MySQL, so read them back
+                ids = dict(
+                    User.objects.filter(username__in=[r["username"] for r in batch]).values_list("username", "id")
+                )
+                UserProfile.objects.bulk_create([
+                    UserProfile(user_id=ids[r["username"]], email_key=email_key(r["email"])) for r in batch
+                ])
+                tokens = [Token(user_id=ids[r["username"]], key=Token.generate_key()) for r in batch]
+                Token.objects.bulk_create(tokens)
+            return [(r["username"], t.key) for r, t in zip(batch, tokens)]
+        except IntegrityError:
+            # someone registered one of these meanwhile: fall back to one transaction per user
+            return self._insert_one_by_one(batch)
+
+    def _insert_one_by_one(self, batch):
+        created = []
+        for r in batch:
+            try:
+                _, token = create_account(r["username"], r["email"], r["password"], r["name"])
+            except IntegrityError:
+                self.stderr.write(f"line {r['line']}: username or email taken meanwhile; skipped")
+                continue
+            created.append((r["username"], token.key))
+        return created
+
+
+def _password_hash(row):
+    if row["password_hash"]:
+        return row["password_hash"]
+    # blank password -> unusable; the user sets one through a reset
+    return make_password(row["raw_password"] or None)
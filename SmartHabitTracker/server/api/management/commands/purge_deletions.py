@@ -0,0 +1,77 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from api.deletion import claim, purge, retry_delay
+from api.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge habits and users scheduled for deletion: completions, reminders and "
+        "rollups are removed in bounded batches, with progress on each DeletionJob."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per DELETE.")
+        parser.add_argument("--pause", type=float, default=0.05,
+                            help="Seconds to sleep between batches, to leave room for live traffic.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs.")
+        parser.add_argument("--interval", type=float, default=10, help="Poll interval with --loop.")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Give up on a job after this many tries.")
+        parser.add_argument("--backoff", type=float, default=60,
+                            help="Seconds before the first retry of a failed job; doubles on each failure.")
+        parser.add_argument("--stale-minutes", type=float, default=15,
+                            help="Reclaim 'running' jobs whose worker has been silent this long.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self._run_pending(options)
+            if not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)."))
+                return
+            if not processed:
+                time.sleep(options["interval"])
+
+    def _run_pending(self, options):
+        now = timezone.now()
+        stale = now - timedelta(minutes=options["stale_minutes"])
+        jobs = DeletionJob.objects.filter(
+            Q(status="pending")
+            | Q(status="failed") & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+            | Q(status="running", heartbeat_at__lt=stale),
+            attempts__lt=options["max_attempts"],
+        )
+
+        processed = 0
+        for job in jobs:
+            if not claim(job):
+                continue  # another worker took it
+            processed += 1
+            started = time.perf_counter()
+            self.stdout.write(f"{job.kind} {job.object_id} ({job.label}): purging")
+
+            try:
+                purge(job, options["batch_size"], options["pause"])
+            except Exception as exc:
+                attempts = job.attempts + 1  # claim() counted this one
+                retry = attempts < options["max_attempts"]
+                DeletionJob.objects.filter(pk=job.pk).update(
+                    status="failed", last_error=repr(exc)[:2000],
+                    next_attempt_at=timezone.now() + retry_delay(attempts, options["backoff"]) if retry else None,
+                )
+                outcome = "will retry" if retry else f"giving up after {attempts} attempt(s)"
+                self.stderr.write(self.style.ERROR(f"  failed: {exc!r}; {outcome}"))
+                continue
+
+            DeletionJob.objects.filter(pk=job.pk).update(
+                status="done", finished_at=timezone.now(), last_error="", next_attempt_at=None,
+            )
+            job.refresh_from_db(fields=["rows_deleted"])
+            self.stdout.write(
+                f"  done: {job.rows_deleted} row(s) in {time.perf_counter() - started:.1f}s"
+            )
+        return processed
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from api.rollups import rebuild_for_user
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyRollup rows from HabitCompletion for all (or selected) users."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", default=[],
+                            help="Username to rebuild (repeatable). Defaults to all users.")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["users"]:
+            users = users.filter(username__in=options["users"])
+
+        total = 0
+        for user_id, username in users.values_list("id", "username").iterator():
+            rows = rebuild_for_user(user_id)
+            total += rows
+            self.stdout.write(f"{username}: {rows} day(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} rollup row(s)."))
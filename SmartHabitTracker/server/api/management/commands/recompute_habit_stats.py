@@ -0,0 +1,246 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from collections import defaultdict
+from itertools import groupby
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from api.archive import unpack_year
+from api.models import CompletionArchive, Habit, HabitCompletion
+from api.streaks import compute_stats, evaluate
+
+
+STAT_FIELDS = ["streak", "total_completions", "last_completed"]
+DIFF_SAMPLE = 20
+
+
+# ==========================================================
+# WORKER SIDE (runs in child processes)
+# ==========================================================
+def _init_worker():
+    import django
+    django.setup()
+    # never reuse a connection inherited from the parent process
+    for conn in connections.all():
+        conn.close()
+
+
+def _shard_filter(lo, hi, prefix=""):
+    lookup = {f"{prefix}user_id__gte": lo}
+    if hi is not None:
+        lookup[f"{prefix}user_id__lt"] = hi
+    return lookup
+
+
+def process_shard(shard, today_iso, batch_size, dry_run):
+    """Recompute one [lo, hi) user-id range. Returns (shard_no, scanned, changed, diffs)."""
+    shard_no, lo, hi = shard
+    today = date.fromisoformat(today_iso)
+
+    habits = (
+        Habit.objects.filter(**_shard_filter(lo, hi))
+        .order_by("id")
+        .only("id", "target", "frequency", "archived_until", *STAT_FIELDS)
+        .iterator(chunk_size=batch_size)
+    )
+    # archive rows are one small bitmap per habit-year, so a shard's worth fits in memory
+    archived = defaultdict(list)
+    for habit_id, year, bitmap in (
+        CompletionArchive.objects.filter(**_shard_filter(lo, hi, "habit__"))
+        .values_list("habit_id", "year", "bitmap")
+        .iterator(chunk_size=batch_size)
+    ):
+        archived[habit_id].extend(unpack_year(bitmap, year))
+
+    completions = groupby(
+        HabitCompletion.objects.filter(**_shard_filter(lo, hi, "habit__"))
+        .order_by("habit_id")
+        .values_list("habit_id", "date")
+        .iterator(chunk_size=batch_size * 10),
+        key=lambda row: row[0],
+    )
+
+    scanned = changed = 0
+    diffs, pending = [], []
+    next_group = next(completions, None)
+
+    for habit in habits:
+        # merge-join: both streams are ordered by habit id
+        while next_group is not None and next_group[0] < habit.id:
+            next_group = next(completions, None)
+        dates = []
+        if next_group is not None and next_group[0] == habit.id:
+            dates = [d for _, d in next_group[1]]
+            next_group = next(completions, None)
+        if habit.archived_until:
+            hot = set(dates)
+            dates += [d for d in archived.pop(habit.id, []) if d not in hot]
+
+        stats = evaluate(habit.target, habit.frequency, dates, today)
+        scanned += 1
+
+        diff = {
+            field: (getattr(habit, field), getattr(stats, _stat_name(field)))
+            for field in STAT_FIELDS
+            if getattr(habit, field) != getattr(stats, _stat_name(field))
+        }
+        if not diff:
+            continue
+
+        if len(diffs) < DIFF_SAMPLE:
+            diffs.append((habit.id, {k: [str(a), str(b)] for k, (a, b) in diff.items()}))
+
+        if dry_run:
+            changed += 1
+            continue
+        pending.append(habit.id)
+        if len(pending) >= batch_size:
+            changed += _write_locked(pending, today)
+            pending = []
+
+    if pending:
+        changed += _write_locked(pending, today)
+
+    connections.close_all()
+    return shard_no, scanned, changed, diffs
+
+
+def _write_locked(habit_ids, today):
+    """
+    Recompute and write the stats of `habit_ids` with their rows locked.
+
+    The scan above reads habits and completions without locks, so a toggle
+    can land in between. toggle_completion bumps total_completions inside
+    the transaction that writes the completion, so under the row lock the
+    counters and the completion rows agree; writing figures from the unlocked
+    scan could overwrite its F() increment. Returns habits actually changed.
+    """
+    with transaction.atomic():
+        habits = list(
+            Habit.objects.select_for_update()
+            .filter(id__in=habit_ids)
+            .order_by("id")
+            .only("id", "target", "frequency", "archived_until", *STAT_FIELDS)
+        )
+        stats = compute_stats(habits, today)
+        changed = []
+        for habit in habits:
+            fresh = stats[habit.id]
+            values = {field: getattr(fresh, _stat_name(field)) for field in STAT_FIELDS}
+            if any(getattr(habit, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(habit, field, value)
+                changed.append(habit)
+        Habit.objects.bulk_update(changed, STAT_FIELDS)
+    return len(changed)
+
+
+def _stat_name(field):
+    return "total" if field == "total_completions" else field
+
+
+# ==========================================================
+# COMMAND
+# ==========================================================
+class Command(BaseCommand):
+    help = (
+        "Recompute streak, total_completions and last_completed for every habit, "
+        "sharded by user across worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--shards", type=int, default=None,
+                            help="Number of user-id shards (default: 4 per worker).")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Rows per bulk_update / iterator chunk.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would change without writing anything.")
+        parser.add_argument("--checkpoint", default="recompute_habit_stats.checkpoint.json",
+                            help="File recording finished shards, used by --resume.")
+        parser.add_argument("--resume", action="store_true",
+                            help="Skip shards already finished in the checkpoint file.")
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        dry_run = options["dry_run"]
+
+        if options["resume"]:
+            if not os.path.exists(checkpoint):
+                raise CommandError(f"No checkpoint at {checkpoint}")
+            with open(checkpoint) as fh:
+                state = json.load(fh)
+        else:
+            state = {
+                "today": timezone.now().date().isoformat(),
+                "shards": self._plan(options["shards"] or options["workers"] * 4),
+                "done": [],
+            }
+
+        todo = [s for s in state["shards"] if s[0] not in state["done"]]
+        self.stdout.write(
+            f"{len(state['shards'])} shard(s), {len(todo)} to process "
+            f"with {options['workers']} worker(s){' [dry run]' if dry_run else ''}"
+        )
+
+        # children must open their own connections
+        connections.close_all()
+
+        started = time.perf_counter()
+        scanned_total = changed_total = 0
+
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(process_shard, shard, state["today"], options["batch_size"], dry_run)
+                for shard in todo
+            ]
+            for n, future in enumerate(as_completed(futures), 1):
+                shard_no, scanned, changed, diffs = future.result()
+                scanned_total += scanned
+                changed_total += changed
+
+                self.stdout.write(
+                    f"[{n}/{len(todo)}] shard {shard_no}: {scanned} habit(s), {changed} changed "
+                    f"({time.perf_counter() - started:.1f}s)"
+                )
+                for habit_id, diff in diffs if dry_run else []:
+                    changes = ", ".join(f"{k}: {a} -> {b}" for k, (a, b) in diff.items())
+                    self.stdout.write(f"    habit {habit_id}: {changes}")
+
+                if not dry_run:
+                    state["done"].append(shard_no)
+                    self._save(checkpoint, state)
+
+        verb = "would change" if dry_run else "updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned_total} habit(s), {verb} {changed_total} "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+        if not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def _plan(self, shard_count):
+        """Split users into contiguous [lo, hi) id ranges; the last range is open-ended."""
+        ids = list(User.objects.order_by("id").values_list("id", flat=True))
+        if not ids:
+            return []
+
+        size = max(1, -(-len(ids) // shard_count))
+        bounds = ids[::size]
+        return [
+            [n, lo, bounds[n + 1] if n + 1 < len(bounds) else None]
+            for n, lo in enumerate(bounds)
+        ]
+
+    def _save(self, path, state):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, path)
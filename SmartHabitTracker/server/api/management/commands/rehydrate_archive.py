@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.archive import rehydrate
+from api.models import CompletionArchive
+
+
+class Command(BaseCommand):
+    help = "Turn archived completion years back into HabitCompletion rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habit", type=int, action="append", default=[], help="Habit id (repeatable).")
+        parser.add_argument("--user", help="Every habit of this username.")
+        parser.add_argument("--year", type=int, action="append", default=[], help="Only these years (repeatable).")
+        parser.add_argument("--all", action="store_true", help="Rehydrate the whole archive.")
+
+    def handle(self, *args, **options):
+        if not (options["habit"] or options["user"] or options["all"]):
+            raise CommandError("Pass --habit, --user or --all.")
+
+        archives = CompletionArchive.objects.order_by("habit_id", "year")
+        if options["habit"]:
+            archives = archives.filter(habit_id__in=options["habit"])
+        if options["user"]:
+            archives = archives.filter(habit__user__username=options["user"])
+        if options["year"]:
+            archives = archives.filter(year__in=options["year"])
+
+        count = archives.count()
+        restored = rehydrate(archives.iterator())
+        self.stdout.write(self.style.SUCCESS(f"Restored {restored} completion(s) from {count} archive year(s)."))
@@ -0,0 +1,221 @@
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from api.models import Habit, HabitCompletion, Reminder, UserProfile
+from api import search
+from api.accounts import email_key
+from api.rollups import rebuild_for_user
+from api.streaks import compute_stats
+
+
+SEED_PASSWORD = "load-test-pass-123"
+
+HABIT_NAMES = [
+    "Drink water", "Morning run", "Read 20 pages", "Meditate", "Journal",
+    "Stretch", "No sugar", "Practice guitar", "Learn Spanish", "Walk 10k steps",
+    "Sleep by 11", "Call family", "Budget review", "Sketch", "Inbox zero",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate load-test data: N users x M habits x Y years of completions "
+        "with realistic adherence patterns, plus reminders, profiles and tokens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--habits", type=int, default=6, help="Habits per user.")
+        parser.add_argument("--years", type=float, default=1.0, help="Years of history per habit.")
+        parser.add_argument("--reminders", type=int, default=3, help="Reminders per user.")
+        parser.add_argument("--prefix", default="load", help="Username prefix for generated users.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--clear", action="store_true",
+                            help="Delete users an earlier run generated with this prefix first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        prefix = options["prefix"]
+        batch = options["batch_size"]
+        started = time.perf_counter()
+
+        existing = User.objects.filter(username__startswith=f"{prefix}-")
+        if options["clear"]:
+            self._clear(existing, prefix)
+        elif existing.exists():
+            raise CommandError(f"Users with prefix '{prefix}-' already exist; use --clear or another --prefix.")
+
+        today = timezone.now().date()
+        history_days = int(options["years"] * 365)
+        first_day = today - timedelta(days=history_days - 1)
+
+        # ---------- users, profiles, tokens ----------
+        password = make_password(SEED_PASSWORD)  # hashed once, shared by every user
+        User.objects.bulk_create(
+            [
+                User(username=f"{prefix}-{n}", email=f"{prefix}-{n}@example.com",
+                     first_name=f"Load {n}", password=password)
+                for n in range(options["users"])
+            ],
+            batch_size=batch,
+        )
+        # bulk_create does not return ids on MySQL, so read them back
+        emails = dict(
+            User.objects.filter(username__startswith=f"{prefix}-").order_by("id").values_list("id", "email")
+        )
+        user_ids = list(emails)
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=uid, email_key=email_key(email)) for uid, email in emails.items()],
+            batch_size=batch,
+        )
+        Token.objects.bulk_create(
+            [Token(user_id=uid, key=Token.generate_key()) for uid in user_ids], batch_size=batch
+        )
+        self._progress(started, f"{len(user_ids)} users")
+
+        # ---------- habits ----------
+        targets = [t for t, _ in Habit.TARGET_CHOICES]
+        categories = [c for c, _ in Habit.CATEGORY_CHOICES]
+        difficulties = [d for d, _ in Habit.DIFFICULTY_CHOICES]
+
+        Habit.objects.bulk_create(
+            [
+                Habit(
+                    user_id=uid,
+                    name=rng.choice(HABIT_NAMES),
+                    description="Generated by seed_load_data",
+                    target=rng.choices(targets, weights=[6, 2, 1, 1, 1])[0],
+                    frequency=rng.randint(1, 4),
+                    category=rng.choice(categories),
+                    difficulty=rng.choice(difficulties),
+                )
+                for uid in user_ids
+                for _ in range(options["habits"])
+            ],
+            batch_size=batch,
+        )
+        habits = list(Habit.objects.filter(user_id__in=user_ids).order_by("id"))
+        Habit.objects.filter(user_id__in=user_ids).update(
+            created_at=datetime.combine(first_day, dt_time.min, tzinfo=dt_timezone.utc)
+        )
+        search.rebuild(habits, batch)  # bulk_create skips Habit.save()
+        self._progress(started, f"{len(habits)} habits")
+
+        # ---------- completions ----------
+        total = 0
+        pending = []
+        for habit in habits:
+            for day in self._pattern(rng, habit, first_day, history_days):
+                pending.append(HabitCompletion(habit_id=habit.id, date=day))
+            if len(pending) >= batch:
+                total += self._flush(pending, batch)
+                pending = []
+        total += self._flush(pending, batch)
+        self._progress(started, f"{total} completions")
+
+        # ---------- reminders ----------
+        by_user = {}
+        for habit in habits:
+            by_user.setdefault(habit.user_id, []).append(habit)
+        Reminder.objects.bulk_create(
+            [
+                Reminder(
+                    user_id=uid,
+                    habit=rng.choice(by_user[uid]) if by_user.get(uid) and rng.random() < 0.8 else None,
+                    time=dt_time(rng.randint(6, 22), rng.choice([0, 15, 30, 45])),
+                    days=rng.choice(["everyday", "weekdays", "weekends"]),
+                    message="Time for your habit!",
+                )
+                for uid in user_ids
+                for _ in range(options["reminders"])
+            ],
+            batch_size=batch,
+        )
+        self._progress(started, "reminders")
+
+        # ---------- derived stats ----------
+        self._refresh_stats(habits, today, batch)
+        for uid in user_ids:
+            rebuild_for_user(uid)
+        self._progress(started, "stats and rollups")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {len(habits)} habits, {total} completions "
+            f"in {time.perf_counter() - started:.1f}s. Password for all users: {SEED_PASSWORD}"
+        ))
+
+    def _pattern(self, rng, habit, first_day, days):
+        """
+        Two-state (on-track / lapsed) Markov chain per habit, with a weekday
+        bias, so histories have realistic streaks, slumps and comebacks.
+        """
+        adherence = rng.uniform(0.35, 0.95)
+        weekend_factor = rng.uniform(0.5, 1.1)
+        if habit.target == "Weekly":
+            per_day = max(habit.frequency, 1) / 7
+        elif habit.target == "Custom":
+            per_day = 1 / max(habit.frequency, 1)
+        else:
+            per_day = 1.0
+
+        on_track = True
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if on_track and rng.random() < 0.01:
+                on_track = False  # start of a slump
+            elif not on_track and rng.random() < 0.08:
+                on_track = True
+
+            p = adherence * per_day * (1 if on_track else 0.15)
+            if day.weekday() >= 5:
+                p *= weekend_factor
+            if habit.target == "Weekdays" and day.weekday() >= 5:
+                p *= 0.1
+            if habit.target == "Weekends" and day.weekday() < 5:
+                p *= 0.1
+
+            if rng.random() < p:
+                yield day
+
+    def _flush(self, completions, batch):
+        with transaction.atomic():
+            HabitCompletion.objects.bulk_create(completions, batch_size=batch)
+        return len(completions)
+
+    def _refresh_stats(self, habits, today, batch):
+        chunk = 1000
+        for start in range(0, len(habits), chunk):
+            part = habits[start:start + chunk]
+            stats = compute_stats(part, today)
+            for habit in part:
+                habit.streak = stats[habit.id].streak
+                habit.total_completions = stats[habit.id].total
+                habit.last_completed = stats[habit.id].last_completed
+            Habit.objects.bulk_update(part, ["streak", "total_completions", "last_completed"], batch_size=batch)
+
+    def _clear(self, existing, prefix):
+        """Delete earlier generated users; refuse if the prefix also matches anyone else."""
+        # every run hashes SEED_PASSWORD once and gives all its users that hash
+        seeded = [
+            encoded for encoded in existing.order_by().values_list("password", flat=True).distinct()
+            if check_password(SEED_PASSWORD, encoded)
+        ]
+        others = existing.exclude(password__in=seeded)
+        if others.exists():
+            raise CommandError(
+                f"{others.count()} user(s) with prefix '{prefix}-' were not generated by this command "
+                f"(e.g. {others.first().username!r}); nothing deleted. Use another --prefix."
+            )
+        existing.filter(password__in=seeded).delete()
+
+    def _progress(self, started, what):
+        self.stdout.write(f"  {time.perf_counter() - started:7.1f}s  {what}")
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import notify
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver due reminder notifications by email (SMTP) and webhook, batched per "
+        "channel, capped per destination, with retries and backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Notifications claimed per delivery round.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling for due reminders.")
+        parser.add_argument("--interval", type=float, default=30, help="Poll interval with --loop.")
+        parser.add_argument("--no-enqueue", action="store_true",
+                            help="Only deliver rows that already exist (another worker enqueues).")
+
+    def handle(self, *args, **options):
+        last_prune = 0.0
+        while True:
+            if time.monotonic() - last_prune > 3600:
+                pruned = notify.prune(settings.NOTIFY_RETENTION_DAYS)
+                if pruned:
+                    self.stdout.write(f"pruned {pruned} old notification(s)")
+                last_prune = time.monotonic()
+
+            totals = self._run_due(options)
+            if not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {totals['sent']}, retrying {totals['retry']}, failed {totals['failed']}."
+                ))
+                return
+            time.sleep(options["interval"])
+
+    def _run_due(self, options):
+        if not options["no_enqueue"]:
+            notify.enqueue_due()
+
+        totals = {"sent": 0, "retry": 0, "failed": 0}
+        while True:
+            started = time.perf_counter()
+            claimed, counts = notify.send_batch(options["batch_size"])
+            if not claimed:
+                return totals
+            for key in totals:
+                totals[key] += counts[key]
+            self.stdout.write(
+                f"{claimed} claimed: {counts['sent']} sent, {counts['retry']} retry, "
+                f"{counts['failed']} failed in {time.perf_counter() - started:.2f}s"
+            )
+            if claimed < options["batch_size"]:
+                return totals
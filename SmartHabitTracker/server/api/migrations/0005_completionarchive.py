@@ -0,0 +1,34 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_deletionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='archived_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CompletionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('bitmap', models.BinaryField(max_length=46)),
+                ('count', models.PositiveSmallIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archives', to='api.habit')),
+            ],
+            options={
+                'ordering': ['year'],
+                'unique_together': {('habit', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:34
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# frozen copy of api.search.tokenize as of this migration, so later changes
+# to the live tokenizer don't change what this migration writes
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(*texts):
+    words = set()
+    for text in texts:
+        text = unicodedata.normalize("NFKD", text or "")
+        text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+        words.update(word[:32] for word in _WORD.findall(text))
+    return words
+
+
+def index_existing_habits(apps, schema_editor):
+    Habit = apps.get_model('api', 'Habit')
+    HabitSearchToken = apps.get_model('api', 'HabitSearchToken')
+    batch = []
+    for habit in Habit.objects.only('id', 'user_id', 'name', 'description').iterator(chunk_size=2000):
+        batch.extend(
+            HabitSearchToken(habit_id=habit.id, user_id=habit.user_id, token=t)
+            for t in tokenize(habit.name, habit.description)
+        )
+        if len(batch) >= 5000:
+            HabitSearchToken.objects.bulk_create(batch)
+            batch = []
+    HabitSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0005_completionarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'category'], name='habit_user_category'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'difficulty'], name='habit_user_difficulty'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'target'], name='habit_user_target'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'streak'], name='habit_user_streak'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'total_completions'], name='habit_user_total'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', 'last_completed'], name='habit_user_last_completed'),
+        ),
+        migrations.AddField(
+            model_name='habitsearchtoken',
+            name='habit',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='api.habit'),
+        ),
+        migrations.AddField(
+            model_name='habitsearchtoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='habitsearchtoken',
+            index=models.Index(fields=['user', 'token'], name='search_user_token'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='habitsearchtoken',
+            unique_together={('habit', 'token')},
+        ),
+        migrations.RunPython(index_existing_habits, migrations.RunPython.noop),
+    ]
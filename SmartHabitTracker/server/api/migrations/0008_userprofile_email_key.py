@@ -0,0 +1,49 @@
+# Generated by Django 4.2.26 on 2026-10-19 17:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_email_keys(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('api', 'UserProfile')
+
+    # login goes through the profile now, so every user needs one
+    have_profile = set(UserProfile.objects.values_list('user_id', flat=True))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=uid) for uid in User.objects.values_list('id', flat=True) if uid not in have_profile],
+        batch_size=2000,
+    )
+
+    # a shared address already broke login for all its users; the oldest account keeps it
+    seen = set()
+    batch = []
+    rows = UserProfile.objects.select_related('user').only('id', 'user__email').order_by('user_id')
+    for profile in rows.iterator(chunk_size=2000):
+        key = (profile.user.email or '').strip().lower() or None
+        if key is None or key in seen:
+            continue
+        seen.add(key)
+        profile.email_key = key
+        batch.append(profile)
+        if len(batch) >= 2000:
+            UserProfile.objects.bulk_update(batch, ['email_key'])
+            batch = []
+    UserProfile.objects.bulk_update(batch, ['email_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0007_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='email_key',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_email_keys, migrations.RunPython.noop),
+    ]
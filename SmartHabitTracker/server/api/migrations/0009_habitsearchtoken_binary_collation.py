@@ -0,0 +1,34 @@
+# Generated by Django 4.2.26 on 2026-10-19 18:20
+
+from django.db import migrations
+
+
+def _set_token_collation(apps, schema_editor, collation):
+    # SQLite already compares TEXT byte by byte; only MySQL needs the change
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    HabitSearchToken = apps.get_model('api', 'HabitSearchToken')
+    table = schema_editor.quote_name(HabitSearchToken._meta.db_table)
+    collate = f' COLLATE {collation}' if collation else ''
+    schema_editor.execute(
+        f'ALTER TABLE {table} MODIFY token varchar(32) CHARACTER SET utf8mb4{collate} NOT NULL'
+    )
+
+
+def binary_collation(apps, schema_editor):
+    _set_token_collation(apps, schema_editor, 'utf8mb4_bin')
+
+
+def default_collation(apps, schema_editor):
+    _set_token_collation(apps, schema_editor, None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_userprofile_email_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(binary_collation, default_collation),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-19 19:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # the tables `manage.py createcachetable` makes for every DatabaseCache in
+    # settings.CACHES, so a fresh `migrate` is enough; existing ones are skipped
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_habitsearchtoken_binary_collation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
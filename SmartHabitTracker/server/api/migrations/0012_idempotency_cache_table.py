@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-19 20:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # same as 0010, for the "idempotency" cache table added to settings.CACHES
+    # after that ran; tables that already exist are skipped
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_deletionjob_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
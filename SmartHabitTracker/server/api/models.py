@@ -1,12 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
 
 
 # =====================================================
 # HABIT MODEL
 # =====================================================
+class ActiveHabitManager(models.Manager):
+    """Default manager: hides habits waiting for the purge_deletions worker."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Habit(models.Model):
 
     DIFFICULTY_CHOICES = [
@@ -62,38 +68,63 @@ class Habit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # completions before this date may live in CompletionArchive (see api/archive.py)
+    archived_until = models.DateField(blank=True, null=True)
+
+    # set when deletion is scheduled; the row and its history are purged later
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = ActiveHabitManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # list filters and sort keys, always scoped to one user
+            models.Index(fields=['user', 'category'], name='habit_user_category'),
+            models.Index(fields=['user', 'difficulty'], name='habit_user_difficulty'),
+            models.Index(fields=['user', 'target'], name='habit_user_target'),
+            models.Index(fields=['user', 'streak'], name='habit_user_streak'),
+            models.Index(fields=['user', 'total_completions'], name='habit_user_total'),
+            models.Index(fields=['user', 'last_completed'], name='habit_user_last_completed'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'name', 'description'} & set(update_fields):
+            from .search import index_habit
+            index_habit(self)
+
 
     # =====================================================
     # Calculate Streak Function
     # =====================================================
     def calculate_streak(self):
-        completions = list(self.completions.order_by('-date').values_list('date', flat=True))
-        if not completions:
-            return 0
+        from .streaks import compute_stats
+        return compute_stats([self])[self.id].streak
 
-        today = timezone.now().date()
-        yesterday = today - timedelta(days=1)
 
-        latest = completions[0]
-        if latest not in [today, yesterday]:
-            return 0
 
-        streak = 1
-        for i in range(1, len(completions)):
-            prev = completions[i-1]
-            current = completions[i]
-            if (prev - current).days == 1:
-                streak += 1
-            else:
-                break
+# =====================================================
+# HABIT SEARCH TOKENS (word index for ?search=)
+# =====================================================
+class HabitSearchToken(models.Model):
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='search_tokens')
+    # copied from the habit so a search is one range scan on (user, token)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # utf8mb4_bin on MySQL (migration 0009) so prefix ranges follow code point order
+    token = models.CharField(max_length=32)
 
-        return streak
+    class Meta:
+        unique_together = ['habit', 'token']
+        indexes = [models.Index(fields=['user', 'token'], name='search_user_token')]
+
+    def __str__(self):
+        return f"{self.token} -> {self.habit_id}"
 
 
 
@@ -114,6 +145,28 @@ class HabitCompletion(models.Model):
 
 
 
+# =====================================================
+# COMPLETION ARCHIVE (cold tier: one bitmap per habit-year)
+# =====================================================
+class CompletionArchive(models.Model):
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='archives')
+    year = models.PositiveSmallIntegerField()
+
+    # 366 bits, little-endian: bit n set == completed on day n of the year (Jan 1 = 0)
+    bitmap = models.BinaryField(max_length=46)
+    count = models.PositiveSmallIntegerField(default=0)
+
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['habit', 'year']
+        ordering = ['year']
+
+    def __str__(self):
+        return f"{self.habit.name} - {self.year}: {self.count}"
+
+
+
 # =====================================================
 # REMINDER MODEL
 # =====================================================
@@ -140,6 +193,10 @@ class Reminder(models.Model):
 
     class Meta:
         ordering = ['time']
+        indexes = [
+            # send_notifications scans reminders by local time-of-day window
+            models.Index(fields=['time'], name='reminder_time'),
+        ]
 
     def __str__(self):
         return f"{self.habit.name if self.habit else 'General'} @ {self.time}"
@@ -158,7 +215,118 @@ class UserProfile(models.Model):
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
     timezone = models.CharField(max_length=50, default='UTC')
     notifications_enabled = models.BooleanField(default=True)
+    # lowercased User.email (NULL when blank): the unique, indexed login key
+    email_key = models.CharField(max_length=254, unique=True, blank=True, null=True, editable=False)
+    # reminders are POSTed here as JSON when set, in addition to email
+    webhook_url = models.URLField(max_length=500, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
+
+
+# =====================================================
+# DAILY ROLLUP (per-user completions per day)
+# =====================================================
+class DailyRollup(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+
+    completed = models.PositiveIntegerField(default=0)
+    active_habits = models.PositiveIntegerField(default=0)
+    category_counts = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.completed}/{self.active_habits}"
+
+
+# =====================================================
+# DELETION JOB (habits / users purged in the background)
+# =====================================================
+class DeletionJob(models.Model):
+
+    KIND_CHOICES = [
+        ('habit', 'Habit'),
+        ('user', 'User'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    label = models.CharField(max_length=200, blank=True, default='')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # failed jobs wait until then before purge_deletions retries them
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"delete {self.kind} {self.object_id} ({self.status}, {self.rows_deleted} rows)"
+
+
+# =====================================================
+# NOTIFICATION (one reminder firing on one channel)
+# =====================================================
+class Notification(models.Model):
+
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('webhook', 'Webhook'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name='notifications', blank=True, null=True)
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    destination = models.CharField(max_length=500)
+    message = models.CharField(max_length=300)
+    due_at = models.DateTimeField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # a reminder fires at most once per channel per due time
+        unique_together = ['reminder', 'channel', 'due_at']
+        ordering = ['due_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notify_status_next'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.destination} @ {self.due_at} ({self.status})"
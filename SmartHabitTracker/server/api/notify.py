@@ -0,0 +1,197 @@
+"""
+Reminder notifications: turning due reminders into Notification rows, and
+the database side of `manage.py send_notifications`.
+
+enqueue_due() writes one row per reminder firing and channel: email to the
+user's address, and a POST to UserProfile.webhook_url when one is set. The
+unique (reminder, channel, due_at) key makes reruns and overlapping workers
+harmless. send_batch() claims due rows, hands them to delivery.deliver()
+and records the outcome: sent, retried later with exponential backoff, or
+failed for good. Delivery is at-least-once; a worker that dies mid-send
+leaves rows in 'sending' that are picked up again after NOTIFY_STALE_SECONDS.
+"""
+import asyncio
+import random
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .delivery import DeliveryError, deliver
+from .models import Notification, Reminder
+
+# Reminder.custom_days holds these names (see the reminder form)
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def _local_spans(since, now, tz):
+    """(local day, after, until) time spans covering (since, now] in `tz`; after=None is midnight."""
+    start, end = since.astimezone(tz), now.astimezone(tz)
+    if start.date() == end.date():
+        return [(end.date(), start.time(), end.time())]
+    return [(start.date(), start.time(), time.max), (end.date(), None, end.time())]
+
+
+def _runs_on(reminder, day):
+    weekday = day.weekday()
+    if reminder["days"] == "weekdays":
+        return weekday < 5
+    if reminder["days"] == "weekends":
+        return weekday >= 5
+    if reminder["days"] == "custom":
+        return WEEKDAYS[weekday] in (reminder["custom_days"] or [])
+    return True
+
+
+def _message(reminder):
+    if reminder["message"]:
+        return reminder["message"]
+    if reminder["habit__name"]:
+        return f"Time for {reminder['habit__name']}"
+    return "Time to check in on your habits"
+
+
+# ==========================================================
+# ENQUEUE
+# ==========================================================
+def enqueue_due(now=None, reminders=None):
+    """Create Notification rows for reminders (default: all) due in the last NOTIFY_LOOKBACK_MINUTES."""
+    now = now or timezone.now()
+    since = now - timedelta(minutes=settings.NOTIFY_LOOKBACK_MINUTES)
+    reminders = (Reminder.objects.all() if reminders is None else reminders).filter(
+        is_active=True, user__is_active=True, user__userprofile__notifications_enabled=True,
+    )
+
+    rows = []
+    # reminder times are local, so each time zone has its own window (one indexed range each)
+    for tz_name in reminders.order_by().values_list("user__userprofile__timezone", flat=True).distinct():
+        tz = _zone(tz_name)
+        for day, after, until in _local_spans(since, now, tz):
+            span = reminders.filter(user__userprofile__timezone=tz_name, time__lte=until)
+            if after is not None:
+                span = span.filter(time__gt=after)
+            for reminder in span.values(
+                "id", "user_id", "time", "days", "custom_days", "message",
+                "habit__name", "user__email", "user__userprofile__webhook_url",
+            ):
+                due = datetime.combine(day, reminder["time"], tzinfo=tz)
+                if not (since < due <= now) or not _runs_on(reminder, day):
+                    continue
+                targets = [
+                    ("email", reminder["user__email"]),
+                    ("webhook", reminder["user__userprofile__webhook_url"]),
+                ]
+                rows += [
+                    Notification(
+                        user_id=reminder["user_id"], reminder_id=reminder["id"],
+                        channel=channel, destination=destination,
+                        message=_message(reminder)[:300], due_at=due, next_attempt_at=due,
+                    )
+                    for channel, destination in targets if destination
+                ]
+
+    Notification.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+# ==========================================================
+# CLAIM / RECORD
+# ==========================================================
+def claim(limit, now=None, queryset=None):
+    """Mark up to `limit` due rows (of `queryset`, default all) 'sending' and return them as dicts."""
+    now = now or timezone.now()
+    queryset = Notification.objects.all() if queryset is None else queryset
+    stale = now - timedelta(seconds=settings.NOTIFY_STALE_SECONDS)
+    queryset.filter(status="sending", claimed_at__lt=stale).update(status="pending")
+
+    ids = list(
+        queryset.filter(status="pending", next_attempt_at__lte=now, user__is_active=True)
+        .order_by("next_attempt_at").values_list("id", flat=True)[:limit]
+    )
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    # rows another worker claimed in between are skipped by the status check
+    Notification.objects.filter(id__in=ids, status="pending").update(
+        status="sending", claimed_at=now, claim_token=token, attempts=F("attempts") + 1,
+    )
+    items = list(
+        Notification.objects.filter(id__in=ids, claim_token=token)
+        .values("id", "channel", "destination", "message", "due_at", "attempts")
+    )
+    for item in items:
+        item["due_at"] = item["due_at"].isoformat()
+    return items
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: doubling, with jitter so retries spread out."""
+    delay = settings.NOTIFY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def record(items, results, now=None):
+    """Write delivery results back. Returns {"sent": n, "retry": n, "failed": n}."""
+    now = now or timezone.now()
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+    sent, updates = [], []
+
+    for item in items:
+        error = results.get(item["id"], DeliveryError("no delivery result"))
+        if error is None:
+            sent.append(item["id"])
+            continue
+        row = Notification(id=item["id"], last_error=str(error)[:2000], claim_token="")
+        if error.permanent or item["attempts"] >= settings.NOTIFY_MAX_ATTEMPTS:
+            row.status, row.next_attempt_at = "failed", now
+        else:
+            row.status, row.next_attempt_at = "pending", now + backoff(item["attempts"])
+        counts["failed" if row.status == "failed" else "retry"] += 1
+        updates.append(row)
+
+    for start in range(0, len(sent), 1000):
+        Notification.objects.filter(id__in=sent[start:start + 1000]).update(
+            status="sent", sent_at=now, last_error="", claim_token="",
+        )
+    Notification.objects.bulk_update(
+        updates, ["status", "next_attempt_at", "last_error", "claim_token"], batch_size=500,
+    )
+    counts["sent"] = len(sent)
+    return counts
+
+
+def send_batch(limit, now=None, queryset=None):
+    """Claim, deliver and record one batch. Returns (claimed, counts)."""
+    items = claim(limit, now, queryset)
+    if not items:
+        return 0, {"sent": 0, "retry": 0, "failed": 0}
+    results = asyncio.run(deliver(items))
+    return len(items), record(items, results)
+
+
+# ==========================================================
+# RETENTION
+# ==========================================================
+def prune(days, batch_size=1000):
+    """Delete finished rows older than `days`. Returns rows deleted."""
+    cutoff = timezone.now() - timedelta(days=days)
+    # finished rows keep next_attempt_at from their last try, so this walks notify_status_next
+    finished = Notification.objects.filter(status__in=["sent", "failed"], next_attempt_at__lt=cutoff)
+    total = 0
+    while True:
+        ids = list(finished.order_by().values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return total
+        deleted, _ = Notification.objects.filter(id__in=ids).delete()
+        total += deleted
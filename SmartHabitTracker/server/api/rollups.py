@@ -0,0 +1,250 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count
+
+from .archive import completion_dates, unpack_year
+from .models import CompletionArchive, Habit, HabitCompletion, DailyRollup
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+def _end_of_day(day):
+    """First instant (UTC) after `day`, for created_at comparisons."""
+    return datetime.combine(day + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+
+
+def active_habit_count(user_id, day):
+    return Habit.objects.filter(user_id=user_id, created_at__lt=_end_of_day(day)).count()
+
+
+def _created_dates(user_id):
+    """Sorted creation dates of the user's habits; bisect_right(dates, day) == active on `day`."""
+    return sorted(
+        dt.date() for dt in
+        Habit.objects.filter(user_id=user_id).values_list("created_at", flat=True)
+    )
+
+
+# ==========================================================
+# INCREMENTAL UPDATE (called on toggle)
+# ==========================================================
+def record_completion(habit, day, delta):
+    """Apply a +1 / -1 completion change for `habit` on `day` to its owner's rollup."""
+    with transaction.atomic():
+        # the category as committed, not as loaded: a locking read waits for a
+        # concurrent category edit, which re-buckets existing days itself
+        category = (
+            Habit.all_objects.select_for_update().filter(pk=habit.pk)
+            .values_list("category", flat=True).first()
+        ) or habit.category
+        rollup, _ = DailyRollup.objects.select_for_update().get_or_create(
+            user_id=habit.user_id, date=day,
+        )
+
+        counts = dict(rollup.category_counts or {})
+        counts[category] = max(0, counts.get(category, 0) + delta)
+        if not counts[category]:
+            del counts[category]
+
+        rollup.completed = max(0, rollup.completed + delta)
+        if not rollup.completed:
+            # no row == no completions, same as a rebuild would leave it
+            rollup.delete()
+            return None
+
+        rollup.category_counts = counts
+        # habits completed that day were active even if created later (backfill)
+        rollup.active_habits = max(active_habit_count(habit.user_id, day), rollup.completed)
+        rollup.save(update_fields=["completed", "category_counts", "active_habits"])
+
+    return rollup
+
+
+def refresh_active_habits(user_id, since, batch_size=500):
+    """Recount active_habits on the user's rows from `since` on (a habit was added or removed)."""
+    created = _created_dates(user_id)
+    total = 0
+    while True:
+        # one transaction per batch of days, so a long history never holds every row lock at once
+        with transaction.atomic():
+            rows = list(
+                DailyRollup.objects.select_for_update()
+                .filter(user_id=user_id, date__gte=since).order_by("date")[:batch_size]
+            )
+            for row in rows:
+                row.active_habits = max(bisect_right(created, row.date), row.completed)
+            DailyRollup.objects.bulk_update(rows, ["active_habits"], batch_size=batch_size)
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+        since = rows[-1].date + timedelta(days=1)
+
+
+def remove_completions(habit, days):
+    """
+    Take one completion of `habit` off its owner's rollup on each of `days`:
+    record_completion(habit, day, -1) for a batch of days. Call inside the
+    transaction that deletes those completions, so a retried purge never
+    subtracts a day twice.
+    """
+    created = _created_dates(habit.user_id)
+    rows = list(DailyRollup.objects.select_for_update().filter(user_id=habit.user_id, date__in=days))
+    changed, emptied = [], []
+    for row in rows:
+        counts = dict(row.category_counts or {})
+        if counts.get(habit.category):
+            counts[habit.category] -= 1
+            if not counts[habit.category]:
+                del counts[habit.category]
+        row.completed = max(0, row.completed - 1)
+        if not row.completed:
+            emptied.append(row.pk)
+            continue
+        row.category_counts = counts
+        row.active_habits = max(bisect_right(created, row.date), row.completed)
+        changed.append(row)
+    DailyRollup.objects.filter(pk__in=emptied).delete()
+    DailyRollup.objects.bulk_update(changed, ["completed", "category_counts", "active_habits"], batch_size=500)
+    return len(rows)
+
+
+def move_category(habit, old, new, batch_size=500):
+    """
+    Move `habit`'s completed days from the `old` to the `new` category bucket.
+    Call inside the transaction that changes the category, with the habit
+    row locked, so no toggle lands between the two.
+    """
+    days = completion_dates([habit])[habit.id]
+    for start in range(0, len(days), batch_size):
+        rows = list(
+            DailyRollup.objects.select_for_update()
+            .filter(user_id=habit.user_id, date__in=days[start:start + batch_size])
+        )
+        for row in rows:
+            counts = dict(row.category_counts or {})
+            if not counts.get(old):
+                continue
+            counts[old] -= 1
+            if not counts[old]:
+                del counts[old]
+            counts[new] = counts.get(new, 0) + 1
+            row.category_counts = counts
+        DailyRollup.objects.bulk_update(rows, ["category_counts"], batch_size=batch_size)
+    return len(days)
+
+
+# ==========================================================
+# FULL REBUILD (management command)
+# ==========================================================
+def rebuild_for_user(user_id):
+    """Recompute every rollup row for one user from raw completions."""
+    rows = (
+        HabitCompletion.objects
+        .filter(habit__user_id=user_id, habit__deleted_at__isnull=True)
+        .values("date", "habit__category")
+        .annotate(n=Count("id"))
+    )
+
+    per_day = defaultdict(dict)
+    for row in rows:
+        per_day[row["date"]][row["habit__category"]] = row["n"]
+
+    archived = (
+        CompletionArchive.objects
+        .filter(habit__user_id=user_id, habit__deleted_at__isnull=True)
+        .values_list("habit__category", "year", "bitmap")
+    )
+    for category, year, bitmap in archived:
+        for day in unpack_year(bitmap, year):
+            per_day[day][category] = per_day[day].get(category, 0) + 1
+
+    created = _created_dates(user_id)
+
+    rollups = [
+        DailyRollup(
+            user_id=user_id,
+            date=day,
+            completed=sum(counts.values()),
+            active_habits=max(bisect_right(created, day), sum(counts.values())),
+            category_counts=counts,
+        )
+        for day, counts in sorted(per_day.items())
+    ]
+
+    with transaction.atomic():
+        DailyRollup.objects.filter(user_id=user_id).delete()
+        DailyRollup.objects.bulk_create(rollups, batch_size=500)
+
+    return len(rollups)
+
+
+# ==========================================================
+# SUMMARIES (O(days) reads)
+# ==========================================================
+def daily_series(user, start, end, today=None):
+    """One entry per day in [start, end], zero-filled where no rollup exists.
+
+    Days after `today` without a rollup count as having no active habits, so
+    the rest of the current month/year does not drag the rate down.
+    """
+    rows = {
+        r.date: r
+        for r in DailyRollup.objects.filter(user=user, date__gte=start, date__lte=end)
+    }
+    created = None
+
+    days = []
+    day = start
+    while day <= end:
+        r = rows.get(day)
+        if r is not None:
+            completed, total, counts = r.completed, r.active_habits, r.category_counts
+        elif today is not None and day > today:
+            completed, total, counts = 0, 0, {}
+        else:
+            if created is None:
+                created = _created_dates(user.id)
+            # same rule as rebuild_for_user: only habits that existed that day
+            completed, total, counts = 0, bisect_right(created, day), {}
+
+        days.append({
+            "date": day.isoformat(),
+            "completed": completed,
+            "active_habits": total,
+            "percentage": round(completed / total * 100) if total else 0,
+            "by_category": counts,
+        })
+        day += timedelta(days=1)
+
+    return days
+
+
+def summarize(days):
+    completed = sum(d["completed"] for d in days)
+    possible = sum(d["active_habits"] for d in days)
+
+    by_category = defaultdict(int)
+    for d in days:
+        for category, n in d["by_category"].items():
+            by_category[category] += n
+
+    return {
+        "completed": completed,
+        "possible": possible,
+        "rate": round(completed / possible * 100) if possible else 0,
+        "by_category": dict(by_category),
+    }
+
+
+def monthly_buckets(days):
+    buckets = defaultdict(list)
+    for d in days:
+        buckets[d["date"][:7]].append(d)
+    return [
+        {"month": month, **summarize(month_days)}
+        for month, month_days in sorted(buckets.items())
+    ]
@@ -0,0 +1,82 @@
+"""
+Word-prefix search over habit names and descriptions.
+
+Every habit's name and description are split into normalized words
+(lowercased, accents stripped) and stored in HabitSearchToken, indexed on
+(user, token). A search term matches a word it is a prefix of, and the
+prefix test is written as a range, token >= "run" AND token < "ruo", so
+it is a plain B-tree range scan on both SQLite and MySQL. LIKE 'run%' only
+uses the index on SQLite when the column is NOCASE, and LIKE '%run%' never
+does. Multiple terms must all match.
+
+The successor bound assumes code point order. SQLite's BINARY collation
+gives that; on MySQL, migration 0009 sets the token column to utf8mb4_bin,
+since accent- and case-folding collations such as utf8mb4_0900_ai_ci sort
+some characters out of code point order and the range would miss words.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+
+from .models import HabitSearchToken
+
+TOKEN_LENGTH = 32
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(*texts):
+    return {word[:TOKEN_LENGTH] for text in texts for word in _WORD.findall(normalize(text))}
+
+
+def _prefix_range(prefix):
+    """[prefix, successor) covers every string that starts with prefix."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# ==========================================================
+# INDEXING
+# ==========================================================
+def index_habit(habit):
+    tokens = tokenize(habit.name, habit.description)
+    with transaction.atomic():
+        HabitSearchToken.objects.filter(habit_id=habit.id).exclude(token__in=tokens).delete()
+        HabitSearchToken.objects.bulk_create(
+            [HabitSearchToken(habit_id=habit.id, user_id=habit.user_id, token=t) for t in tokens],
+            ignore_conflicts=True,
+        )
+
+
+def rebuild(habits, batch_size=1000):
+    """Reindex many habits at once (bulk-created ones never go through save())."""
+    habits = list(habits)
+    with transaction.atomic():
+        HabitSearchToken.objects.filter(habit__in=habits).delete()
+        HabitSearchToken.objects.bulk_create(
+            [
+                HabitSearchToken(habit_id=h.id, user_id=h.user_id, token=t)
+                for h in habits
+                for t in tokenize(h.name, h.description)
+            ],
+            batch_size=batch_size,
+        )
+
+
+# ==========================================================
+# QUERYING
+# ==========================================================
+def filter_search(queryset, user, query):
+    """Narrow `queryset` to habits whose words start with every term in `query`."""
+    for term in sorted(tokenize(query)):
+        low, high = _prefix_range(term)
+        matching = HabitSearchToken.objects.filter(
+            user=user, token__gte=low, token__lt=high,
+        ).values("habit_id")
+        queryset = queryset.filter(id__in=matching)
+    return queryset
+
@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError
+from . import accounts
 from .models import Habit, HabitCompletion, Reminder, UserProfile
+from .archive import completion_dates
 
 
 
@@ -42,6 +47,11 @@ class ProfileUpdateSerializer(serializers.Serializer):
     email = serializers.EmailField(required=False)
     avatar = serializers.ImageField(required=False)
 
+    def validate_email(self, value):
+        if accounts.email_taken(value, exclude_user=self.instance):
+            raise serializers.ValidationError("An account with this email already exists.")
+        return value
+
     def update(self, user, validated_data):
         profile, _ = UserProfile.objects.get_or_create(user=user)
 
@@ -65,31 +75,44 @@ class ProfileUpdateSerializer(serializers.Serializer):
 # REGISTER
 # ==========================================================
 class RegisterSerializer(serializers.ModelSerializer):
-    password = serializers.CharField(write_only=True, validators=[validate_password])
+    password = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
     name = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = User
         fields = ["username", "email", "password", "password2", "name"]
+        # no UniqueValidator: the unique indexes decide in create(), saving a query per signup
+        extra_kwargs = {"username": {"validators": [User.username_validator]}}
 
     def validate(self, attrs):
         if attrs["password"] != attrs["password2"]:
             raise serializers.ValidationError({"password": "Passwords do not match"})
+
+        # with the would-be user, so UserAttributeSimilarityValidator has something to compare
+        candidate = User(username=attrs["username"], email=attrs.get("email", ""), first_name=attrs.get("name", ""))
+        try:
+            validate_password(attrs["password"], user=candidate)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({"password": list(exc.messages)})
         return attrs
 
     def create(self, validated_data):
-        validated_data.pop("password2")
-        name = validated_data.pop("name", "")
-
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data.get("email", ""),
-            password=validated_data["password"],
-            first_name=name
-        )
-
-        UserProfile.objects.create(user=user)
+        username = validated_data["username"]
+        email = validated_data.get("email", "")
+        # hashed before the transaction opens, so no row locks are held meanwhile
+        password_hash = make_password(validated_data["password"])
+
+        try:
+            user, _ = accounts.create_account(username, email, password_hash, validated_data.get("name", ""))
+        except IntegrityError:
+            # only a clash pays for the lookups that say which field it was
+            errors = {}
+            if User.objects.filter(username=User.normalize_username(username)).exists():
+                errors["username"] = ["A user with that username already exists."]
+            if accounts.email_taken(email):
+                errors["email"] = ["An account with this email already exists."]
+            raise serializers.ValidationError(errors or {"non_field_errors": ["Could not create the account."]})
         return user
 
 
@@ -138,7 +161,8 @@ class HabitSerializer(serializers.ModelSerializer):
         ]
 
     def get_completions(self, obj):
-        return list(obj.completions.values_list("date", flat=True))
+        # hot rows plus any archived years
+        return sorted(completion_dates([obj])[obj.id], reverse=True)
 
     def get_image_url(self, obj):
         if obj.image:
@@ -185,6 +209,8 @@ class ReminderSerializer(serializers.ModelSerializer):
 # ==========================================================
 class ToggleCompletionSerializer(serializers.Serializer):
     date = serializers.DateField(required=False)
+    # set-state instead of flip: a retry with the same value changes nothing
+    completed = serializers.BooleanField(required=False, allow_null=True, default=None)
 
 
 
@@ -0,0 +1,259 @@
+"""
+Target-aware streak / consistency engine.
+
+A habit's history is packed into a Python int used as a day bitset: bit i is
+set when the habit was completed on `today - i`, so "today" is bit 0 and older
+days sit in higher bits. Streaks and consistency are then worked out with
+shifts, masks and popcounts instead of walking dates one by one.
+
+Target semantics:
+    Daily     every day counts; streak = consecutive completed days.
+    Weekdays  Mon-Fri are scheduled; Sat/Sun neither count nor break a streak.
+    Weekends  Sat/Sun are scheduled; Mon-Fri neither count nor break a streak.
+    Weekly    at least `frequency` completions per Monday-based week;
+              streak = consecutive weeks that met the target.
+    Custom    at least one completion every `frequency` days;
+              streak = completions in the unbroken chain.
+
+The current day (or week, for Weekly) is a grace period: not having done it
+yet does not break the streak, matching the old "today or yesterday" rule.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .archive import completion_dates
+
+
+HabitStats = namedtuple("HabitStats", ["streak", "consistency", "total", "last_completed"])
+
+SCHEDULES = {
+    "Daily": frozenset(range(7)),
+    "Weekdays": frozenset(range(5)),
+    "Weekends": frozenset((5, 6)),
+}
+
+DEFAULT_WINDOW = 7
+
+
+# ==========================================================
+# BIT HELPERS
+# ==========================================================
+def _popcount(x):
+    return bin(x).count("1")
+
+
+def _trailing_zeros(x):
+    return (x & -x).bit_length() - 1
+
+
+def _trailing_ones(x):
+    return _trailing_zeros(~x)
+
+
+def _low_mask(n):
+    return (1 << n) - 1
+
+
+def pack_days(dates, today):
+    """Pack dates on or before `today` into a bitset (bit i == today - i)."""
+    offsets = [(today - d).days for d in dates]
+    offsets = [i for i in offsets if i >= 0]
+    if not offsets:
+        return 0, 0
+
+    span = max(offsets) + 1
+    buf = bytearray((span + 7) // 8)
+    for i in offsets:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little"), span
+
+
+def schedule_mask(weekdays, today, length):
+    """Bitset of the next `length` days (going back from today) whose weekday is scheduled."""
+    pattern = 0
+    for i in range(7):
+        if (today.weekday() - i) % 7 in weekdays:
+            pattern |= 1 << i
+
+    weeks = (length + 6) // 7
+    repunit = _low_mask(7 * weeks) // 0x7F
+    return (pattern * repunit) & _low_mask(length)
+
+
+# ==========================================================
+# STREAKS
+# ==========================================================
+def _scheduled_streak(bits, weekdays, today, length):
+    sched = schedule_mask(weekdays, today, length)
+    done = bits & sched
+
+    if sched & 1 and not done & 1:
+        sched &= ~1  # today is still open
+
+    misses = sched & ~done
+    if not misses:
+        return _popcount(done)
+    return _popcount(done & _low_mask(_trailing_zeros(misses)))
+
+
+def _weekly_streak(bits, frequency, today):
+    frequency = max(frequency, 1)
+    this_week = today.weekday() + 1
+
+    streak = 1 if _popcount(bits & _low_mask(this_week)) >= frequency else 0
+
+    rest = bits >> this_week
+    while rest and _popcount(rest & 0x7F) >= frequency:
+        streak += 1
+        rest >>= 7
+
+    return streak
+
+
+def _interval_streak(bits, every):
+    every = max(every, 1)
+    if not bits:
+        return 0
+
+    latest = _trailing_zeros(bits)
+    if latest > every:
+        return 0
+
+    # each completion "covers" itself and the every-1 days before it
+    covered, width = bits, 1
+    while width < every:
+        step = min(width, every - width)
+        covered |= covered << step
+        width += step
+
+    end = latest + _trailing_ones(covered >> latest)
+    return _popcount(bits & _low_mask(end))
+
+
+def _streak(target, frequency, bits, span, today):
+    if target == "Weekly":
+        return _weekly_streak(bits, frequency, today)
+    if target == "Custom":
+        return _interval_streak(bits, frequency)
+
+    weekdays = SCHEDULES.get(target, SCHEDULES["Daily"])
+    # one extra week past the oldest completion guarantees a scheduled miss
+    return _scheduled_streak(bits, weekdays, today, span + 8)
+
+
+# ==========================================================
+# CONSISTENCY (% of the target met over the last `window` days)
+# ==========================================================
+def _consistency(target, frequency, bits, today, window):
+    in_window = bits & _low_mask(window)
+
+    if target == "Weekly":
+        expected = max(frequency, 1) * window / 7
+        done = _popcount(in_window)
+    elif target == "Custom":
+        expected = -(-window // max(frequency, 1))
+        done = _popcount(in_window)
+    else:
+        weekdays = SCHEDULES.get(target, SCHEDULES["Daily"])
+        sched = schedule_mask(weekdays, today, window)
+        expected = _popcount(sched)
+        done = _popcount(in_window & sched)
+
+    if not expected:
+        return 0
+    return round(min(done / expected, 1) * 100)
+
+
+# ==========================================================
+# PUBLIC API
+# ==========================================================
+def evaluate(target, frequency, dates, today, window=DEFAULT_WINDOW):
+    """Stats for a single habit from its completion dates."""
+    dates = list(dates)
+    bits, span = pack_days(dates, today)
+
+    return HabitStats(
+        streak=_streak(target, frequency, bits, span, today),
+        consistency=_consistency(target, frequency, bits, today, window),
+        total=len(dates),
+        last_completed=max(dates) if dates else None,
+    )
+
+
+def compute_stats(habits, today=None, window=DEFAULT_WINDOW):
+    """Stats for many habits from one completions query (two if any are archived) -> {habit_id: HabitStats}."""
+    habits = list(habits)
+    today = today or timezone.now().date()
+    dates = completion_dates(habits)
+
+    return {
+        h.id: evaluate(h.target, h.frequency, dates[h.id], today, window)
+        for h in habits
+    }
+
+
+# ==========================================================
+# REFERENCE IMPLEMENTATION (slow, date by date; used by api.tests)
+# ==========================================================
+def reference_evaluate(target, frequency, dates, today, window=DEFAULT_WINDOW):
+    dates = list(dates)
+    done = {d for d in dates if d <= today}
+    frequency = max(frequency, 1)
+
+    if target == "Weekly":
+        def week_count(start):
+            return sum(1 for i in range(7) if start + timedelta(days=i) in done)
+
+        week = today - timedelta(days=today.weekday())
+        streak = 1 if week_count(week) >= frequency else 0
+        week -= timedelta(days=7)
+        while week_count(week) >= frequency:
+            streak += 1
+            week -= timedelta(days=7)
+
+    elif target == "Custom":
+        ordered = sorted(done, reverse=True)
+        streak = 0
+        if ordered and (today - ordered[0]).days <= frequency:
+            streak = 1
+            for prev, cur in zip(ordered, ordered[1:]):
+                if (prev - cur).days > frequency:
+                    break
+                streak += 1
+
+    else:
+        weekdays = SCHEDULES.get(target, SCHEDULES["Daily"])
+        day = today
+        if day.weekday() in weekdays and day not in done:
+            day -= timedelta(days=1)
+
+        streak = 0
+        earliest = min(done) if done else today
+        while day >= earliest:
+            if day.weekday() in weekdays:
+                if day not in done:
+                    break
+                streak += 1
+            day -= timedelta(days=1)
+
+    recent = [today - timedelta(days=i) for i in range(window)]
+    if target == "Weekly":
+        expected = frequency * window / 7
+        hit = sum(1 for d in recent if d in done)
+    elif target == "Custom":
+        expected = -(-window // frequency)
+        hit = sum(1 for d in recent if d in done)
+    else:
+        weekdays = SCHEDULES.get(target, SCHEDULES["Daily"])
+        expected = sum(1 for d in recent if d.weekday() in weekdays)
+        hit = sum(1 for d in recent if d.weekday() in weekdays and d in done)
+    consistency = round(min(hit / expected, 1) * 100) if expected else 0
+
+    return HabitStats(
+        streak=streak,
+        consistency=consistency,
+        total=len(dates),
+        last_completed=max(dates) if dates else None,
+    )
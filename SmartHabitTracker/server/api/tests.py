@@ -0,0 +1,979 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import tempfile
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_login_failed
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.db.utils import load_backend
+from django.db.models import Sum
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from config import db_router
+from config.db import pool
+
+from . import notify, rollups
+from .archive import completion_dates, pack_year
+from .delivery import DeliveryError, check_webhook_url, deliver
+from .management.commands import provision_users
+from .management.commands.bench_notifications import HttpSink, SinkServer
+from .models import (
+    CompletionArchive, DailyRollup, DeletionJob, Habit, HabitCompletion, Notification, Reminder, UserProfile,
+)
+from .streaks import compute_stats, evaluate, reference_evaluate
+from .tracking import set_completion, toggle_completion
+
+
+# ==========================================================
+# STREAK ENGINE
+# ==========================================================
+class StreakEngineTests(SimpleTestCase):
+    """The bitset engine against the slow date-by-date reference on random histories."""
+
+    iterations = 5000
+    max_days = 120
+
+    def test_engine_matches_reference(self):
+        seed = random.randrange(1 << 32)
+        rng = random.Random(seed)
+        for n in range(self.iterations):
+            target, frequency, dates, today, window = case = self._random_case(rng)
+            with self.subTest(n=n, seed=seed):
+                self.assertEqual(
+                    evaluate(*case), reference_evaluate(*case),
+                    f"target={target} frequency={frequency} today={today} "
+                    f"window={window} dates={sorted(dates)}",
+                )
+
+    def test_empty_history(self):
+        for target, _ in Habit.TARGET_CHOICES:
+            stats = evaluate(target, 1, [], date(2024, 3, 1))
+            self.assertEqual((stats.streak, stats.total, stats.last_completed), (0, 0, None))
+
+    def _random_case(self, rng):
+        today = date(2024, 1, 1) + timedelta(days=rng.randrange(366 * 3))
+        span = rng.randrange(1, self.max_days + 1)
+
+        # mix dense streaks with sparse noise so both long chains and gaps show up
+        density = rng.choice([0.1, 0.5, 0.8, 0.95, 1.0])
+        dates = [
+            today - timedelta(days=i)
+            for i in range(-3, span)
+            if rng.random() < density
+        ]
+
+        return (
+            rng.choice([t for t, _ in Habit.TARGET_CHOICES]),
+            rng.randrange(1, 6),
+            dates,
+            today,
+            rng.choice([7, 14, 30]),
+        )
+
+
+# ==========================================================
+# CONCURRENT TOGGLES
+# ==========================================================
+class ConcurrentToggleTests(TransactionTestCase):
+    """Many threads toggling one habit; counters must still match the rows."""
+
+    threads = 8
+    toggles = 50
+    days = 3  # few dates, so threads collide on the same rows
+
+    def test_counters_match_rows(self):
+        user = User.objects.create_user(username="toggler")
+        habit = Habit.objects.create(user=user, name="Stress test")
+        today = timezone.now().date()
+        dates = [today - timedelta(days=i) for i in range(self.days)]
+        errors = []
+        done = []
+
+        def worker(n):
+            rng = random.Random(n)
+            local = Habit(pk=habit.pk, user_id=user.pk)
+            try:
+                for _ in range(self.toggles):
+                    day = rng.choice(dates)
+                    while True:
+                        try:
+                            local.refresh_from_db()
+                            toggle_completion(local, day)
+                            break
+                        except OperationalError:
+                            # SQLite reports write contention as "database is locked"
+                            time.sleep(rng.random() / 100)
+                done.append(n)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(self.threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(done), self.threads)
+        habit.refresh_from_db()
+        rows = HabitCompletion.objects.filter(habit=habit).count()
+        rolled = DailyRollup.objects.filter(user=user).aggregate(n=Sum("completed"))["n"] or 0
+        self.assertEqual(habit.total_completions, rows)
+        self.assertEqual(rolled, rows)
+        stats = compute_stats([habit])[habit.id]
+        self.assertEqual((habit.streak, habit.last_completed), (stats.streak, stats.last_completed))
+
+
+# ==========================================================
+# ARCHIVE TIER
+# ==========================================================
+class ArchivedToggleTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="archivist")
+        self.day = date(2020, 5, 4)
+        self.habit = Habit.objects.create(user=user, name="Old habit", archived_until=date(2021, 1, 1))
+        CompletionArchive.objects.create(
+            habit=self.habit, year=2020, bitmap=pack_year([self.day], 2020), count=1,
+        )
+
+    def test_uncomplete_day_in_both_tiers(self):
+        HabitCompletion.objects.create(habit=self.habit, date=self.day)
+
+        self.assertEqual(set_completion(self.habit, self.day, False)[0], "uncompleted")
+        self.assertEqual(completion_dates([self.habit])[self.habit.id], [])
+        self.assertFalse(HabitCompletion.objects.filter(habit=self.habit).exists())
+
+    def test_toggle_archived_day(self):
+        self.assertEqual(toggle_completion(self.habit, self.day), "uncompleted")
+        self.assertEqual(toggle_completion(self.habit, self.day), "completed")
+        self.assertEqual(completion_dates([self.habit])[self.habit.id], [self.day])
+
+
+# ==========================================================
+# NOTIFICATIONS
+# ==========================================================
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reminded", email="reminded@example.com")
+        UserProfile.objects.filter(user=self.user).update(webhook_url="http://hooks.example.com/in")
+        self.now = timezone.now().replace(microsecond=0)
+        Reminder.objects.create(user=self.user, time=(self.now - timedelta(minutes=2)).time(), message="Stretch")
+
+    def _item(self, destination):
+        return {"id": 1, "channel": "webhook", "destination": destination,
+                "message": "Stretch", "due_at": self.now.isoformat()}
+
+    def test_enqueue_is_idempotent(self):
+        notify.enqueue_due(self.now)
+        notify.enqueue_due(self.now)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("channel", "destination")),
+            [("email", "reminded@example.com"), ("webhook", "http://hooks.example.com/in")],
+        )
+
+    def test_record_sends_retries_and_fails(self):
+        notify.enqueue_due(self.now)
+        items = notify.claim(10, self.now)
+        by_channel = {item["channel"]: item["id"] for item in items}
+
+        counts = notify.record(items, {by_channel["email"]: None, by_channel["webhook"]: DeliveryError("HTTP 503")},
+                               self.now)
+        self.assertEqual(counts, {"sent": 1, "retry": 1, "failed": 0})
+        retry = Notification.objects.get(id=by_channel["webhook"])
+        self.assertEqual(retry.status, "pending")
+        self.assertGreater(retry.next_attempt_at, self.now)
+
+        later = retry.next_attempt_at
+        items = notify.claim(10, later)
+        notify.record(items, {retry.id: DeliveryError("HTTP 404", permanent=True)}, later)
+        self.assertEqual(Notification.objects.get(id=retry.id).status, "failed")
+
+    def test_private_webhooks_refused(self):
+        for url in ["http://127.0.0.1:9/in", "http://10.1.2.3/in", "http://169.254.169.254/latest", "http://[::1]/in"]:
+            with self.subTest(url=url), self.assertRaises(DeliveryError):
+                check_webhook_url(url)
+        check_webhook_url("https://93.184.216.34/in")
+
+        results = asyncio.run(deliver([self._item("http://127.0.0.1:9/in")]))
+        self.assertTrue(results[1].permanent)
+
+    def test_profile_rejects_private_webhook(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch("/api/profile/", {"webhook_url": "http://localhost:8000/in"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UserProfile.objects.get(user=self.user).webhook_url, "http://hooks.example.com/in")
+
+    @override_settings(NOTIFY_ALLOW_PRIVATE_WEBHOOKS=True)
+    def test_webhook_delivered_when_private_allowed(self):
+        sink = HttpSink(0.0, random.Random(0))
+        with SinkServer([sink]):
+            results = asyncio.run(deliver([self._item(f"http://127.0.0.1:{sink.port}/in")]))
+        self.assertEqual(results, {1: None})
+        self.assertEqual(sink.received, 1)
+
+
+# ==========================================================
+# ACCOUNTS
+# ==========================================================
+class ProfileEmailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mover", email="old@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_email_change_moves_key(self):
+        response = self.client.patch("/api/profile/", {"email": "New@Example.com", "timezone": "UTC"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserProfile.objects.get(user=self.user).email_key, "new@example.com")
+
+    def test_email_taken_meanwhile(self):
+        User.objects.create_user(username="racer", email="taken@example.com")
+        # the pre-check passes, as it would for a signup committing right after it
+        with mock.patch("api.accounts.email_taken", return_value=False):
+            response = self.client.patch("/api/profile/", {"email": "taken@example.com"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "old@example.com")
+
+
+class LoginRegisterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="ada", email="Ada@Example.com", password="s3cret-pass-42")
+
+    def _login(self, email, password="s3cret-pass-42"):
+        return self.client.post("/api/login/", {"email": email, "password": password}, format="json")
+
+    def test_login_ignores_email_case(self):
+        for email in ["ada@example.com", "ADA@EXAMPLE.COM", " Ada@Example.com "]:
+            with self.subTest(email=email):
+                response = self._login(email)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["user"]["id"], self.user.id)
+                self.assertEqual(response.data["token"], Token.objects.get(user=self.user).key)
+
+    def test_failed_logins_signal(self):
+        failed = []
+
+        def receiver(sender, credentials, **kwargs):
+            failed.append(credentials)
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+
+        self.assertEqual(self._login("ada@example.com", "wrong").status_code, 401)
+        self.assertEqual(self._login("nobody@example.com").status_code, 401)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self._login("ada@example.com").status_code, 401)
+        self.assertEqual(len(failed), 3)
+        self.assertEqual(failed[0]["username"], "ada")
+
+    def test_register_duplicate_email(self):
+        response = self.client.post("/api/register/", {
+            "username": "ada2", "email": "ADA@example.com",
+            "password": "an0ther-pass-42", "password2": "an0ther-pass-42",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.data)
+        self.assertFalse(User.objects.filter(username="ada2").exists())
+
+    def test_create_user_with_taken_email(self):
+        twin = User.objects.create_user(username="ada-twin", email="ada@example.com")
+        self.assertIsNone(UserProfile.objects.get(user=twin).email_key)
+        self.assertEqual(self._login("ada@example.com").data["user"]["id"], self.user.id)
+
+
+class ProvisionUsersTests(TestCase):
+    def _provision(self, rows, *args):
+        path = os.path.join(tempfile.mkdtemp(), "users.csv")
+        with open(path, "w") as fh:
+            fh.write("username,email,password,name\n" + "".join(f"{row}\n" for row in rows))
+        out, err = StringIO(), StringIO()
+        call_command("provision_users", path, "--workers", "2", "--batch-size", "2", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_creates_accounts_and_skips_bad_rows(self):
+        User.objects.create_user(username="taken", email="Existing@example.com")
+        tokens = os.path.join(tempfile.mkdtemp(), "tokens.csv")
+
+        out, err = self._provision([
+            "amy,Amy@Example.com,pass-word-1,Amy",
+            "bob,bob@example.com,pass-word-2,",
+            "cat,cat@example.com,,Cat",
+            "bob,bob2@example.com,pass-word-3,",    # username repeated in file
+            "dan,AMY@example.com,pass-word-4,",     # email repeated in file
+            "eve,existing@EXAMPLE.com,pass-word-5,",  # email already registered
+            "taken,new@example.com,pass-word-6,",   # username already registered
+            "f g,fg@example.com,pass-word-7,",      # invalid username
+        ], "--tokens-out", tokens)
+
+        self.assertIn("Created 3 user(s)", out)
+        self.assertEqual(err.count("skipped"), 5)
+        amy = User.objects.get(username="amy")
+        self.assertTrue(amy.check_password("pass-word-1"))
+        self.assertEqual(amy.first_name, "Amy")
+        self.assertFalse(User.objects.get(username="cat").has_usable_password())
+        self.assertEqual(UserProfile.objects.get(user=amy).email_key, "amy@example.com")
+        with open(tokens) as fh:
+            self.assertEqual(
+                list(csv.reader(fh))[1:],
+                [[u, Token.objects.get(user__username=u).key] for u in ("amy", "bob", "cat")],
+            )
+        # provisioned users log in by email like registered ones
+        response = self.client.post("/api/login/", {"email": "AMY@example.com", "password": "pass-word-1"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_taken_meanwhile_falls_back_to_one_by_one(self):
+        # the pre-check misses an account registered after it ran
+        with mock.patch.object(provision_users.Command, "_drop_existing", lambda self, rows: rows):
+            User.objects.create_user(username="zed", email="zed@example.com")
+            out, err = self._provision(["amy,amy@example.com,pass-word-1,", "zed,zed2@example.com,pass-word-2,"])
+        self.assertIn("Created 1 user(s)", out)
+        self.assertIn("taken meanwhile", err)
+        self.assertTrue(User.objects.filter(username="amy").exists())
+
+
+# ==========================================================
+# DAILY ROLLUPS / STATS
+# ==========================================================
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="roller")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+        self.run = Habit.objects.create(user=self.user, name="Run", category="fitness")
+        self.read = Habit.objects.create(user=self.user, name="Read", category="learning")
+
+    def _rollup(self, day):
+        return DailyRollup.objects.filter(user=self.user, date=day).values_list(
+            "completed", "active_habits", "category_counts",
+        ).first()
+
+    def test_daily_series_zero_fills(self):
+        week_ago = self.today - timedelta(days=7)
+        Habit.objects.filter(pk=self.read.pk).update(created_at=timezone.now() - timedelta(days=3))
+
+        days = rollups.daily_series(self.user, week_ago, self.today + timedelta(days=1), today=self.today)
+
+        self.assertEqual(len(days), 9)
+        self.assertEqual([d["completed"] for d in days], [0] * 9)
+        # only habits that existed on the day count; days after today count none
+        self.assertEqual([d["active_habits"] for d in days], [0] * 4 + [1] * 3 + [2, 0])
+
+    def test_record_completion(self):
+        toggle_completion(self.run, self.today)
+        toggle_completion(self.read, self.today)
+        self.assertEqual(self._rollup(self.today), (2, 2, {"fitness": 1, "learning": 1}))
+
+        toggle_completion(self.run, self.today)
+        self.assertEqual(self._rollup(self.today), (1, 2, {"learning": 1}))
+        toggle_completion(self.read, self.today)
+        self.assertIsNone(self._rollup(self.today))
+
+    def test_category_edit_moves_existing_days(self):
+        yesterday = self.today - timedelta(days=1)
+        toggle_completion(self.run, yesterday)
+
+        response = self.client.patch(f"/api/habits/{self.run.id}/", {"category": "health"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._rollup(yesterday)[2], {"health": 1})
+
+        # un-toggling the old day takes it from the new bucket
+        self.run.refresh_from_db()
+        toggle_completion(self.run, yesterday)
+        self.assertIsNone(self._rollup(yesterday))
+
+    def test_stats(self):
+        toggle_completion(self.run, self.today)
+        data = self.client.get("/api/stats/weekly/").data
+        self.assertEqual(data["summary"]["completed"], 1)
+        self.assertEqual(data["days"][-1]["by_category"], {"fitness": 1})
+
+    def test_stats_rejects_bad_params(self):
+        for url in [
+            "/api/stats/weekly/?end=yesterday",
+            "/api/stats/monthly/?year=2024&month=13",
+            "/api/stats/monthly/?month=x",
+            "/api/stats/yearly/?year=abc",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 400)
+
+
+# ==========================================================
+# HABIT LIST (SEARCH / FILTERS / ORDERING)
+# ==========================================================
+class HabitListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="lister")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.run = Habit.objects.create(
+            user=self.user, name="Morning run", category="fitness", difficulty="hard", streak=5,
+        )
+        self.read = Habit.objects.create(
+            user=self.user, name="Read", description="Café études", category="learning", streak=9,
+        )
+        self.water = Habit.objects.create(
+            user=self.user, name="Drink water", category="health", difficulty="easy", target="Weekly", streak=1,
+        )
+        other = User.objects.create_user(username="neighbour")
+        Habit.objects.create(user=other, name="Running club", category="fitness")
+
+    def _names(self, query):
+        response = self.client.get(f"/api/habits/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [h["name"] for h in response.data]
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self._names("search=run"), ["Morning run"])
+        self.assertEqual(self._names("search=MORN"), ["Morning run"])
+        self.assertEqual(self._names("search=orning"), [])
+        # every term must match
+        self.assertEqual(self._names("search=morning%20wat"), [])
+        self.assertEqual(self._names("search=drink%20wat"), ["Drink water"])
+
+    def test_search_ignores_accents(self):
+        self.assertEqual(self._names("search=cafe"), ["Read"])
+        self.assertEqual(self._names("search=%C3%A9tu"), ["Read"])
+
+    def test_search_follows_edits(self):
+        self.client.patch(f"/api/habits/{self.run.id}/", {"name": "Evening jog"}, format="json")
+        self.assertEqual(self._names("search=run"), [])
+        self.assertEqual(self._names("search=jog"), ["Evening jog"])
+
+    def test_comma_separated_filters(self):
+        self.assertEqual(sorted(self._names("category=fitness,health")), ["Drink water", "Morning run"])
+        self.assertEqual(self._names("category=fitness,health&difficulty=easy"), ["Drink water"])
+        self.assertEqual(self._names("target=Weekly"), ["Drink water"])
+
+    def test_ordering(self):
+        self.assertEqual(self._names("ordering=streak"), ["Drink water", "Morning run", "Read"])
+        self.assertEqual(self._names("ordering=-streak"), ["Read", "Morning run", "Drink water"])
+        self.assertEqual(self._names("ordering=name&category=fitness,learning"), ["Morning run", "Read"])
+
+    def test_rejects_invalid_values(self):
+        for query, field in [
+            ("category=fitness,sports", "category"),
+            ("difficulty=extreme", "difficulty"),
+            ("target=daily", "target"),
+            ("ordering=password", "ordering"),
+            ("ordering=-user", "ordering"),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/habits/?{query}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+
+
+# ==========================================================
+# IDEMPOTENCY KEYS
+# ==========================================================
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="retrier")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name="Run")
+        self.url = f"/api/habits/{self.habit.id}/toggle_completion/"
+        self.today = timezone.now().date().isoformat()
+
+    def _toggle(self, key, **data):
+        return self.client.post(self.url, {"date": self.today, **data}, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def _completions(self):
+        return HabitCompletion.objects.filter(habit=self.habit).count()
+
+    def test_retry_replays_first_response(self):
+        first = self._toggle("k1")
+        again = self._toggle("k1")
+
+        self.assertEqual(again.status_code, first.status_code)
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        # a plain toggle would have flipped the day back
+        self.assertEqual(self._completions(), 1)
+
+    def test_key_reuse_with_other_body_is_422(self):
+        self._toggle("k1")
+        response = self._toggle("k1", completed=False)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self._completions(), 1)
+
+    def test_in_flight_key_is_409(self):
+        digest = hashlib.sha256(b"k1").hexdigest()
+        caches["idempotency"].add(f"idem:{self.user.pk}:{digest}:lock", 1)
+        self.assertEqual(self._toggle("k1").status_code, 409)
+        self.assertEqual(self._completions(), 0)
+
+    def test_response_stored_while_taking_lock_is_replayed(self):
+        store = caches["idempotency"]
+        first = self._toggle("k1")
+        stored = store.get(f"idem:{self.user.pk}:{hashlib.sha256(b'k1').hexdigest()}")
+
+        # the first attempt stores its response and frees the lock between our get() and add()
+        with mock.patch.object(store, "get", side_effect=[None, stored]):
+            again = self._toggle("k1")
+
+        self.assertEqual(again.data, first.data)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(self._completions(), 1)
+
+    def test_set_state_is_a_no_op_when_already_set(self):
+        first = self._toggle("k1", completed=True)
+        self.assertTrue(first.data["changed"])
+        # a fresh key, e.g. after the stored response expired
+        second = self._toggle("k2", completed=True)
+        self.assertEqual(second.data["action"], first.data["action"])
+        self.assertFalse(second.data["changed"])
+        self.assertEqual(self._completions(), 1)
+
+    def test_server_errors_are_not_stored(self):
+        with mock.patch("api.views.tracking.set_completion", side_effect=RuntimeError("boom")):
+            self.client.raise_request_exception = False
+            self.assertEqual(self._toggle("k1").status_code, 500)
+        self.client.raise_request_exception = True
+        self.assertEqual(self._toggle("k1").status_code, 200)
+        self.assertEqual(self._completions(), 1)
+
+
+# ==========================================================
+# CALENDARS
+# ==========================================================
+class CalendarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="planner")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name="Run")
+        self.today = timezone.now().date()
+        self.url = f"/api/habits/{self.habit.id}/calendar/?year={self.today.year}"
+
+    def test_toggle_changes_next_calendar(self):
+        before = self.client.get(self.url).data
+        self.assertEqual(before["total"], 0)
+        # served from the calendars cache now
+        self.assertEqual(self.client.get(self.url).data, before)
+
+        self.client.post(f"/api/habits/{self.habit.id}/toggle_completion/", {"date": self.today.isoformat()})
+        after = self.client.get(self.url).data
+        self.assertEqual(after["total"], 1)
+        day = self.today.timetuple().tm_yday - 1
+        self.assertTrue(after["bitset"][day // 8] >> (day % 8) & 1)
+
+        self.client.post(f"/api/habits/{self.habit.id}/toggle_completion/", {"date": self.today.isoformat()})
+        self.assertEqual(self.client.get(self.url).data["bitset"], before["bitset"])
+
+    def test_rejects_bad_params(self):
+        for query in ["year=abc", "year=0", "encoding=hex"]:
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/habits/{self.habit.id}/calendar/?{query}")
+                self.assertEqual(response.status_code, 400)
+
+
+# ==========================================================
+# RECOMPUTE_HABIT_STATS
+# ==========================================================
+# worker threads instead of processes, so the shards see the test database;
+# one worker, since SQLite's shared in-memory test database table-locks across threads
+@mock.patch("api.management.commands.recompute_habit_stats.ProcessPoolExecutor", ThreadPoolExecutor)
+class RecomputeHabitStatsTests(TransactionTestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.habits = []
+        for n in range(2):
+            user = User.objects.create_user(username=f"shard-{n}")
+            for m in range(3):
+                habit = Habit.objects.create(user=user, name=f"Habit {m}")
+                for i in range(m + n + 1):
+                    toggle_completion(habit, today - timedelta(days=i))
+                self.habits.append(habit)
+        # one habit with part of its history in the archive tier
+        archived = self.habits[-1]
+        CompletionArchive.objects.create(
+            habit=archived, year=2020, bitmap=pack_year([date(2020, 3, 1), date(2020, 3, 2)], 2020), count=2,
+        )
+        Habit.objects.filter(pk=archived.pk).update(archived_until=date(2021, 1, 1))
+
+        self.expected = {
+            habit_id: (stats.streak, stats.total, stats.last_completed)
+            for habit_id, stats in compute_stats(Habit.objects.all()).items()
+        }
+        Habit.objects.update(streak=99, total_completions=0, last_completed=None)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+
+    def _stats(self, habits=None):
+        return {
+            h.id: (h.streak, h.total_completions, h.last_completed)
+            for h in Habit.objects.filter(id__in=[h.id for h in habits or self.habits])
+        }
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("recompute_habit_stats", "--workers", "1", "--shards", "2",
+                     "--checkpoint", self.checkpoint, *args, stdout=out)
+        return out.getvalue()
+
+    def test_restores_computed_values(self):
+        self.assertIn("updated 6", self._run())
+        self.assertEqual(self._stats(), self.expected)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_writes_nothing(self):
+        out = self._run("--dry-run")
+        self.assertIn("would change 6", out)
+        self.assertIn("streak: 99 ->", out)
+        self.assertEqual(set(self._stats().values()), {(99, 0, None)})
+
+    def test_resume_skips_finished_shards(self):
+        first, second = sorted(User.objects.filter(username__startswith="shard-").values_list("id", flat=True))
+        with open(self.checkpoint, "w") as fh:
+            json.dump({
+                "today": timezone.now().date().isoformat(),
+                "shards": [[0, first, second], [1, second, None]],
+                "done": [0],
+            }, fh)
+
+        self._run("--resume")
+
+        stats = self._stats()
+        for habit in self.habits:
+            expected = (99, 0, None) if habit.user_id == first else self.expected[habit.id]
+            self.assertEqual(stats[habit.id], expected)
+
+
+# ==========================================================
+# SEED_LOAD_DATA
+# ==========================================================
+class SeedLoadDataTests(TestCase):
+    def _seed(self, *args):
+        call_command("seed_load_data", "--users", "2", "--habits", "1", "--years", "0.05",
+                     "--reminders", "1", "--prefix", "seedtest", *args, stdout=StringIO())
+
+    def test_clear_replaces_generated_users(self):
+        self._seed()
+        first = set(User.objects.filter(username__startswith="seedtest-").values_list("id", flat=True))
+        self._seed("--clear")
+        second = set(User.objects.filter(username__startswith="seedtest-").values_list("id", flat=True))
+        self.assertEqual(len(second), 2)
+        self.assertFalse(first & second)
+
+    def test_clear_refuses_other_users(self):
+        self._seed()
+        User.objects.create_user(username="seedtest-real", password="someone-else's")
+        with self.assertRaises(CommandError):
+            self._seed("--clear")
+        self.assertEqual(User.objects.filter(username__startswith="seedtest-").count(), 3)
+
+
+# ==========================================================
+# PRIMARY / REPLICA ROUTING
+# ==========================================================
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """The test database is the primary; replica1 is a second SQLite file with different rows."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(self._drop_replica)
+        self._add_replica(os.path.join(self.tmp, "replica.sqlite3"))
+        replica = connections["replica1"]
+        with replica.schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Habit)
+        user = User.objects.create_user(username="reader")
+        User.objects.using("replica1").create(pk=user.pk, username="reader")
+        Habit.objects.create(user=user, name="on primary")
+        # bulk_create: Habit.save() would index search tokens on the primary
+        Habit.objects.using("replica1").bulk_create([Habit(user_id=user.pk, name="on replica")])
+
+        cache.clear()
+        db_router._down_until.clear()
+        self.factory = RequestFactory()
+
+    def _drop_replica(self):
+        if "replica1" in connections.settings:
+            connections["replica1"].close()
+            del connections["replica1"]
+            del connections.settings["replica1"]
+
+    def _add_replica(self, name):
+        self._drop_replica()
+        config = connections.configure_settings({
+            "default": connections.settings["default"],
+            "replica1": {"ENGINE": "django.db.backends.sqlite3", "NAME": name},
+        })
+        connections.settings["replica1"] = config["replica1"]
+
+    def _request(self, method="get", token="abc", pin=None, fill_cache=False):
+        def view(request):
+            if pin:
+                db_router.pin_client(pin)
+            if fill_cache:
+                cache.set("filled-by-a-get", 1)
+            if request.method == "POST":
+                Habit.objects.filter(name="on primary").update(notes="touched")
+            return HttpResponse(",".join(Habit.objects.values_list("name", flat=True)))
+
+        request = getattr(self.factory, method)("/", HTTP_AUTHORIZATION=f"Token {token}")
+        return db_router.ReadYourWritesMiddleware(view)(request).content.decode()
+
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self._request(), "on replica")
+        # outside a request (commands, workers) everything reads the primary
+        self.assertEqual(list(Habit.objects.values_list("name", flat=True)), ["on primary"])
+
+    def test_write_pins_client_to_primary(self):
+        self.assertEqual(self._request("post"), "on primary")
+        self.assertEqual(self._request(), "on primary")
+        self.assertEqual(self._request(token="someone-else"), "on replica")
+
+    def test_cache_write_does_not_pin(self):
+        self.assertEqual(self._request(fill_cache=True), "on replica")
+        self.assertEqual(cache.get("filled-by-a-get"), 1)
+        self.assertEqual(self._request(), "on replica")
+
+    def test_issued_token_is_pinned(self):
+        self._request("post", token="", pin="fresh-token")
+        self.assertEqual(self._request(token="fresh-token"), "on primary")
+
+    def test_down_replica_is_skipped(self):
+        # a read-only URI to a file that does not exist fails to connect
+        self._add_replica(f"file:{os.path.join(self.tmp, 'missing.sqlite3')}?mode=ro")
+
+        self.assertEqual(self._request(), "on primary")
+        self.assertIn("replica1", db_router._down_until)
+        self.assertEqual(self._request(), "on primary")
+
+    @override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "no_such_cache_table",
+    }})
+    def test_missing_cache_table_does_not_fail_requests(self):
+        self.assertEqual(self._request("post"), "on primary")
+        self.assertEqual(self._request(), "on replica")
+
+
+# ==========================================================
+# CONNECTION POOL
+# ==========================================================
+class ConnectionPoolTests(SimpleTestCase):
+    """config.db.pool and the pooled SQLite backend against a temporary database file."""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "pool.sqlite3")
+        # cleanups run last-in first-out: close idle connections, then forget the pools
+        self.addCleanup(pool._pools.clear)
+        self.addCleanup(pool.close_idle)
+
+    def _pool(self, **options):
+        options = {"MAX_SIZE": 2, "TIMEOUT": 0.2, "MAX_LIFETIME": 60, "HEALTH_CHECK_AFTER": 60, **options}
+        return pool.get_pool(f"test-{self._testMethodName}", {"POOL": options})
+
+    def _connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def _ping(self, conn):
+        conn.execute("SELECT 1").fetchall()
+
+    def test_released_connection_is_reused(self):
+        p = self._pool()
+        conn = p.acquire(self._connect, self._ping)
+        p.release(conn)
+        self.assertIs(p.acquire(self._connect, self._ping), conn)
+        self.assertEqual((p.metrics["created"], p.metrics["reused"]), (1, 1))
+        self.assertEqual(p.stats()["in_use"], 1)
+
+    def test_unreusable_connection_is_discarded(self):
+        p = self._pool()
+        conn = p.acquire(self._connect, self._ping)
+        p.release(conn, reusable=False)
+        self.assertEqual(p.stats()["open"], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+        self.assertIsNot(p.acquire(self._connect, self._ping), conn)
+
+    def test_failed_health_check_replaces_connection(self):
+        p = self._pool(HEALTH_CHECK_AFTER=0)
+        conn = p.acquire(self._connect, self._ping)
+        p.release(conn)
+        conn.close()  # the server dropped it while idle
+
+        fresh = p.acquire(self._connect, self._ping)
+        self.assertIsNot(fresh, conn)
+        self._ping(fresh)
+        self.assertEqual(p.metrics["failed_checks"], 1)
+        self.assertEqual(p.stats()["open"], 1)
+
+    def test_expired_connection_is_recycled(self):
+        p = self._pool(MAX_LIFETIME=0)
+        conn = p.acquire(self._connect, self._ping)
+        p.release(conn)
+        self.assertIsNot(p.acquire(self._connect, self._ping), conn)
+        self.assertEqual(p.metrics["created"], 2)
+
+    def test_borrowers_wait_at_max_size(self):
+        p = self._pool(MAX_SIZE=1)
+        conn = p.acquire(self._connect, self._ping)
+        with self.assertRaises(pool.PoolTimeout):
+            p.acquire(self._connect, self._ping)
+
+        threading.Timer(0.05, p.release, args=(conn,)).start()
+        self.assertIs(p.acquire(self._connect, self._ping), conn)
+        self.assertEqual(p.metrics["timeouts"], 1)
+        self.assertEqual(p.metrics["waits"], 2)
+
+    def test_failed_connect_frees_its_slot(self):
+        p = self._pool(MAX_SIZE=1)
+
+        def broken():
+            raise sqlite3.OperationalError("unable to open database file")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            p.acquire(broken, self._ping)
+        self.assertEqual(p.stats()["open"], 0)
+        p.acquire(self._connect, self._ping)
+
+    def test_backend_borrows_from_pool(self):
+        settings = connections.configure_settings({
+            "default": {"ENGINE": "config.db.sqlite3", "NAME": self.path},
+        })["default"]
+        wrapper = load_backend(settings["ENGINE"]).DatabaseWrapper(settings, "pooltest")
+
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw)
+
+        # a connection closed mid-transaction is not handed to the next borrower
+        wrapper.set_autocommit(False)
+        wrapper.close()
+        self.assertEqual(pool._pools["pooltest"].stats()["open"], 0)
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, raw)
+        wrapper.close()
+
+
+# ==========================================================
+# DELETION
+# ==========================================================
+class DeletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="leaver")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+        self.run = Habit.objects.create(user=self.user, name="Run", category="fitness")
+        self.read = Habit.objects.create(user=self.user, name="Read", category="learning")
+        Habit.objects.update(created_at=timezone.now() - timedelta(days=10))
+        for i in range(5):
+            toggle_completion(self.run, self.today - timedelta(days=i))
+        for i in range(3):
+            toggle_completion(self.read, self.today - timedelta(days=i))
+        CompletionArchive.objects.create(
+            habit=self.run, year=2020, bitmap=pack_year([date(2020, 3, 1), date(2020, 3, 2)], 2020), count=2,
+        )
+        Habit.objects.filter(pk=self.run.pk).update(archived_until=date(2021, 1, 1))
+        Reminder.objects.create(user=self.user, habit=self.run, time="08:00")
+        rollups.rebuild_for_user(self.user.id)
+
+    def _rollups(self):
+        return list(
+            DailyRollup.objects.filter(user=self.user).order_by("date")
+            .values_list("date", "completed", "active_habits", "category_counts")
+        )
+
+    def _purge(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("purge_deletions", "--batch-size", "2", "--pause", "0", *args, stdout=out, stderr=err)
+        return out.getvalue() + err.getvalue()
+
+    def test_schedule_hides_habit(self):
+        response = self.client.delete(f"/api/habits/{self.run.id}/")
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual([h["id"] for h in self.client.get("/api/habits/").data], [self.read.id])
+        self.assertFalse(Reminder.objects.filter(habit_id=self.run.id).exists())
+        self.assertEqual(DeletionJob.objects.get(kind="habit", object_id=self.run.id).status, "pending")
+        # history stays until the worker purges it; today's total drops right away
+        self.assertEqual(HabitCompletion.objects.filter(habit_id=self.run.id).count(), 5)
+        self.assertEqual(DailyRollup.objects.get(user=self.user, date=self.today).active_habits, 2)
+        self.assertEqual(self.client.get(f"/api/habits/{self.run.id}/").status_code, 404)
+
+    def test_purge_habit_subtracts_only_its_days(self):
+        self.client.delete(f"/api/habits/{self.run.id}/")
+        self.assertIn("Processed 1 job(s).", self._purge())
+
+        self.assertFalse(Habit.all_objects.filter(pk=self.run.pk).exists())
+        self.assertFalse(HabitCompletion.objects.filter(habit_id=self.run.id).exists())
+        self.assertFalse(CompletionArchive.objects.filter(habit_id=self.run.id).exists())
+        job = DeletionJob.objects.get(kind="habit", object_id=self.run.id)
+        self.assertEqual(job.status, "done")
+        # completions, the archive row, the habit and its search tokens
+        self.assertGreater(job.rows_deleted, 5 + 1 + 1)
+
+        purged = self._rollups()
+        rollups.rebuild_for_user(self.user.id)
+        self.assertEqual(purged, self._rollups())
+        self.assertEqual(
+            [(completed, active, counts) for _, completed, active, counts in purged],
+            [(1, 1, {"learning": 1})] * 3,
+        )
+
+    def test_purge_user(self):
+        other = User.objects.create_user(username="stayer")
+        kept = Habit.objects.create(user=other, name="Stay")
+        toggle_completion(kept, self.today)
+
+        self.assertEqual(self.client.delete("/api/profile/").status_code, 204)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 0)
+        self._purge()
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(Habit.all_objects.values_list("id", flat=True)), [kept.id])
+        self.assertFalse(CompletionArchive.objects.exists())
+        self.assertFalse(DailyRollup.objects.filter(user=self.user).exists())
+        self.assertEqual(HabitCompletion.objects.filter(habit=kept).count(), 1)
+
+    @mock.patch("api.management.commands.purge_deletions.purge", side_effect=OperationalError("gone away"))
+    def test_failed_job_backs_off_then_gives_up(self, purge):
+        self.client.delete(f"/api/habits/{self.run.id}/")
+        job = DeletionJob.objects.get()
+
+        self.assertIn("will retry", self._purge("--max-attempts", "2", "--backoff", "60"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+        self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        # not due yet
+        self.assertIn("Processed 0 job(s).", self._purge("--max-attempts", "2"))
+
+        DeletionJob.objects.update(next_attempt_at=timezone.now())
+        self.assertIn("giving up after 2 attempt(s)", self._purge("--max-attempts", "2"))
+        self.assertIn("Processed 0 job(s).", self._purge("--max-attempts", "2"))
+        self.assertEqual(purge.call_count, 2)
+        # the habit is still hidden, never half-purged
+        self.assertTrue(HabitCompletion.objects.filter(habit_id=self.run.id).exists())
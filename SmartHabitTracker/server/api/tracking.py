@@ -0,0 +1,94 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Habit, HabitCompletion
+from . import archive, rollups
+from .streaks import compute_stats
+
+
+# ==========================================================
+# TOGGLE / SET A COMPLETION
+# ==========================================================
+def toggle_completion(habit, day):
+    """
+    Flip the completion of `habit` on `day`. Returns "completed" or "uncompleted".
+
+    The write path is a single short transaction: a conditional DELETE, or an
+    INSERT if nothing was deleted, plus F() counter and rollup updates. The
+    streak is recomputed afterwards from a plain read, so no lock is held while
+    the history is scanned.
+    """
+    return set_completion(habit, day)[0]
+
+
+def set_completion(habit, day, completed=None):
+    """
+    Set `habit` on `day` to `completed` (flip when None). Returns (action, changed).
+
+    When the day is already in the requested state nothing is written and the
+    streak is not recomputed, so retried requests are cheap.
+    """
+    with transaction.atomic():
+        # days in an archived year live in the archive bitmap instead
+        result = archive.set_archived(habit, day, completed)
+        if result is None:
+            result = _set_hot(habit, day, completed)
+        action, delta = result
+        _apply_delta(habit, day, delta)
+
+    if not delta:
+        return action, False
+
+    refresh_streak(habit)
+    return action, True
+
+
+def _set_hot(habit, day, completed):
+    if completed is not True:
+        deleted, _ = HabitCompletion.objects.filter(habit_id=habit.id, date=day).delete()
+        if deleted:
+            return "uncompleted", -1
+        if completed is False:
+            return "uncompleted", 0
+
+    try:
+        with transaction.atomic():
+            HabitCompletion.objects.create(habit_id=habit.id, date=day)
+    except IntegrityError:
+        # already completed, or another request completed it between our DELETE and INSERT
+        return "completed", 0
+    return "completed", 1
+
+
+def _apply_delta(habit, day, delta):
+    if delta > 0:
+        Habit.objects.filter(pk=habit.pk).update(total_completions=F("total_completions") + 1)
+    elif delta < 0:
+        Habit.objects.filter(pk=habit.pk, total_completions__gt=0).update(
+            total_completions=F("total_completions") - 1
+        )
+    else:
+        return
+
+    rollups.record_completion(habit, day, delta)
+
+
+def refresh_streak(habit):
+    """
+    Recompute streak / last_completed and write only those columns.
+
+    Read and write happen under the habit's row lock: without it, the
+    recompute of an older toggle could finish last and write its stale
+    streak over a newer one.
+    """
+    with transaction.atomic():
+        locked = Habit.all_objects.select_for_update().get(pk=habit.pk)
+        stats = compute_stats([locked])[habit.id]
+        locked.streak = stats.streak
+        locked.last_completed = stats.last_completed
+        # the updated_at bump also moves the habit to fresh calendar cache keys
+        locked.save(update_fields=["streak", "last_completed", "updated_at"])
+
+    for field in ("streak", "last_completed", "updated_at", "total_completions"):
+        setattr(habit, field, getattr(locked, field))
+    return stats
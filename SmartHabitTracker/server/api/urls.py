@@ -19,6 +19,17 @@ urlpatterns = [
     # PROFILE (GET + PATCH)
     path('profile/', views.profile_view, name='profile'),
 
+    # STATS (DailyRollup summaries)
+    path('stats/weekly/', views.stats_view, {'period': 'weekly'}, name='stats-weekly'),
+    path('stats/monthly/', views.stats_view, {'period': 'monthly'}, name='stats-monthly'),
+    path('stats/yearly/', views.stats_view, {'period': 'yearly'}, name='stats-yearly'),
+
+    # HEATMAP (packed bitsets per habit-year)
+    path('heatmap/', views.heatmap_view, name='heatmap'),
+
+    # DB CONNECTION POOL METRICS (staff only)
+    path('health/db-pool/', views.db_pool_view, name='db-pool'),
+
     # AI Suggestions → FIXED for frontend
     path('ai/', views.ai_suggestions_view, name='ai-root'),
     path('ai/suggestions/', views.ai_suggestions_view, name='ai-suggestions'),
@@ -1,16 +1,28 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.authtoken.models import Token
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.exceptions import ValidationError
 
 from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import URLValidator
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date as date_cls, timedelta
+import calendar
 import random
 
-from .models import Habit, HabitCompletion, Reminder, UserProfile
+from config.db.pool import all_stats
+from config.db_router import pin_client
+
+from .models import Habit, Reminder, UserProfile
+from . import accounts, calendars, deletion, delivery, rollups, search, tracking
+from .archive import completion_dates
+from .idempotency import idempotent
+from .streaks import compute_stats
 from .serializers import (
     RegisterSerializer, LoginSerializer,
     HabitSerializer, HabitCreateSerializer,
@@ -29,8 +41,8 @@ class RegisterView(generics.CreateAPIView):
         serializer = RegisterSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-
-        token, _ = Token.objects.get_or_create(user=user)
+        token = accounts.token_for(user)  # created with the user, no query
+        pin_client(token.key)  # its first dashboard load must see the new account
 
         return Response({
             "success": True,
@@ -52,19 +64,22 @@ class LoginView(generics.GenericAPIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        email = request.data.get("email")
-        password = request.data.get("password")
+        password = request.data.get("password") or ""
+        found = accounts.find_by_email(request.data.get("email"))
+        if found is None:
+            make_password(password)  # unknown emails take as long as wrong passwords
 
-        try:
-            user_obj = User.objects.get(email=email)
-            user = authenticate(username=user_obj.username, password=password)
-        except User.DoesNotExist:
-            user = None
+        # through the auth backends, so is_active, hash upgrades and the
+        # user_login_failed signal (lockout / audit hooks) all apply
+        user = authenticate(request, username=found.username if found else None, password=password)
+        if user is not None and user.pk == found.pk:
+            user = found  # same row, with the token find_by_email() joined in
 
         if not user:
             return Response({"success": False, "error": "Invalid email or password"}, status=401)
 
-        token, _ = Token.objects.get_or_create(user=user)
+        token = accounts.token_for(user)
+        pin_client(token.key)
 
         return Response({
             "success": True,
@@ -93,11 +108,16 @@ def logout_view(request):
 
 
 # ==========================================================
-# PROFILE (GET + PATCH + AVATAR UPLOAD)
+# PROFILE (GET + PATCH + AVATAR UPLOAD + DELETE)
 # ==========================================================
-@api_view(["GET", "PATCH"])
+@api_view(["GET", "PATCH", "DELETE"])
 @permission_classes([IsAuthenticated])
 def profile_view(request):
+    # ---------- DELETE (account is locked now, purged by purge_deletions) ----------
+    if request.method == "DELETE":
+        deletion.schedule_user_deletion(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     profile, _ = UserProfile.objects.get_or_create(user=request.user)
 
     # ---------- GET ----------
@@ -110,19 +130,10 @@ def profile_view(request):
             "name": request.user.first_name or request.user.username,
             "createdAt": request.user.date_joined.isoformat(),
             "avatar": avatar_url,
-            "avatar_url": avatar_url
+            "avatar_url": avatar_url,
+            "webhook_url": profile.webhook_url,
         })
 
-    # ---------- PATCH ----------
-    name = request.data.get("name")
-    email = request.data.get("email")
-
-    if name:
-        request.user.first_name = name
-    if email:
-        request.user.email = email
-    request.user.save()
-
     # ---------- PATCH ----------
     if request.method == "PATCH":
         # allow form-data (for avatar) or JSON body
@@ -130,13 +141,34 @@ def profile_view(request):
         email = request.data.get("email")
         tz = request.data.get("timezone")
         notifications = request.data.get("notifications_enabled")
+        webhook_url = request.data.get("webhook_url")
+
+        if email and accounts.email_taken(email, exclude_user=request.user):
+            return Response({"email": "An account with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
+        if webhook_url:
+            try:
+                URLValidator(schemes=["http", "https"])(webhook_url)
+            except DjangoValidationError:
+                return Response({"webhook_url": "Enter a valid http(s) URL."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                delivery.check_webhook_url(webhook_url)
+            except delivery.DeliveryError as exc:
+                return Response({"webhook_url": f"Webhook host must be a public address ({exc})."},
+                                status=status.HTTP_400_BAD_REQUEST)
 
         # update User fields
         if name:
             request.user.first_name = name
         if email:
             request.user.email = email
-        request.user.save()
+        try:
+            # the email_key index catches an address taken since the check above
+            with transaction.atomic():
+                request.user.save()
+        except IntegrityError:
+            return Response({"email": "An account with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
+        # sync_email_key moved the key in the database; don't save the old one back below
+        profile.refresh_from_db(fields=["email_key"])
 
         # update profile fields
         if tz:
@@ -148,6 +180,8 @@ def profile_view(request):
             else:
                 notifications_value = bool(notifications)
             profile.notifications_enabled = notifications_value
+        if webhook_url is not None:
+            profile.webhook_url = webhook_url  # "" turns webhook delivery off
         profile.save()
 
 
@@ -165,7 +199,8 @@ def profile_view(request):
         "name": request.user.first_name or request.user.username,
         "createdAt": request.user.date_joined.isoformat(),
         "avatar": avatar_url,
-        "avatar_url": avatar_url
+        "avatar_url": avatar_url,
+        "webhook_url": profile.webhook_url,
     })
 
 
@@ -175,8 +210,41 @@ def profile_view(request):
 class HabitViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
+    # ?ordering= accepts these, with an optional "-" for descending
+    ORDERING_FIELDS = ["streak", "total_completions", "last_completed", "created_at", "name"]
+
     def get_queryset(self):
-        return Habit.objects.filter(user=self.request.user)
+        qs = Habit.objects.filter(user=self.request.user)
+        if self.action in ("list", "completions"):
+            qs = self._filter(qs, self.request.query_params)
+        return qs
+
+    def _filter(self, qs, params):
+        # ---------- category / difficulty / target (comma-separated) ----------
+        for field, choices in (
+            ("category", Habit.CATEGORY_CHOICES),
+            ("difficulty", Habit.DIFFICULTY_CHOICES),
+            ("target", Habit.TARGET_CHOICES),
+        ):
+            if params.get(field):
+                values = params[field].split(",")
+                allowed = {value for value, _ in choices}
+                if not set(values) <= allowed:
+                    raise ValidationError({field: f"Choose from: {', '.join(sorted(allowed))}"})
+                qs = qs.filter(**{f"{field}__in": values})
+
+        # ---------- search (word prefixes of name / description) ----------
+        if params.get("search"):
+            qs = search.filter_search(qs, self.request.user, params["search"])
+
+        # ---------- ordering ----------
+        if params.get("ordering"):
+            ordering = params["ordering"]
+            if ordering.lstrip("-") not in self.ORDERING_FIELDS:
+                raise ValidationError({"ordering": f"Choose from: {', '.join(self.ORDERING_FIELDS)}"})
+            qs = qs.order_by(ordering, "-created_at")
+
+        return qs
 
     def get_serializer_class(self):
         if self.action in ["create", "update", "partial_update"]:
@@ -191,6 +259,7 @@ class HabitViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         habit = serializer.save(user=request.user)
+        rollups.refresh_active_habits(request.user.id, habit.created_at.date())
 
         return Response(HabitSerializer(habit, context={"request": request}).data)
 
@@ -204,15 +273,27 @@ class HabitViewSet(viewsets.ModelViewSet):
             context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
-        habit = serializer.save()
+        with transaction.atomic():
+            # the row lock keeps toggles out until the rollups are re-bucketed
+            old_category = Habit.objects.select_for_update().values_list("category", flat=True).get(pk=habit.pk)
+            habit = serializer.save()
+            if habit.category != old_category:
+                rollups.move_category(habit, old_category, habit.category)
 
         return Response(HabitSerializer(habit, context={"request": request}).data)
 
     def partial_update(self, request, *args, **kwargs):
         return self.update(request, *args, **kwargs)
 
+    # ---------- DELETE (hidden now, history purged by purge_deletions) ----------
+    def perform_destroy(self, instance):
+        deletion.schedule_habit_deletion(instance)
+
     # ---------- TOGGLE COMPLETION ----------
+    # {"completed": true/false} sets the state instead of flipping it; an
+    # Idempotency-Key header makes retries replay the first response
     @action(detail=True, methods=["POST"])
+    @idempotent
     def toggle_completion(self, request, pk=None):
         habit = self.get_object()
         serializer = ToggleCompletionSerializer(data=request.data)
@@ -220,31 +301,40 @@ class HabitViewSet(viewsets.ModelViewSet):
 
         date = serializer.validated_data.get("date") or timezone.now().date()
 
-        completion, created = HabitCompletion.objects.get_or_create(habit=habit, date=date)
-
-        if not created:
-            completion.delete()
-            action = "uncompleted"
-        else:
-            action = "completed"
-
-        habit.total_completions = habit.completions.count()
-        habit.streak = habit.calculate_streak()
-        habit.save()
+        action, changed = tracking.set_completion(habit, date, serializer.validated_data["completed"])
 
         return Response({
             "action": action,
+            "changed": changed,
             "habit": HabitSerializer(habit, context={"request": request}).data,
-            "completions": list(habit.completions.values_list("date", flat=True))
+            "completions": sorted(completion_dates([habit])[habit.id], reverse=True)
+        })
+
+    # ---------- YEAR CALENDAR (packed bitset) ----------
+    @action(detail=True, methods=["GET"])
+    def calendar(self, request, pk=None):
+        habit = self.get_object()
+        params = _calendar_params(request)
+        if params is None:
+            return Response({"error": "Invalid year or encoding"}, status=status.HTTP_400_BAD_REQUEST)
+        year, encoding = params
+
+        bitmap, months = calendars.habit_years([habit], year)[habit.id]
+        return Response({
+            "habit": habit.id,
+            "year": year,
+            "encoding": encoding,
+            "bitset": calendars.encode(bitmap, encoding),
+            "months": months,
+            "total": sum(months),
         })
 
     # ---------- GET ALL COMPLETIONS ----------
     @action(detail=False, methods=["GET"])
     def completions(self, request):
-        out = {}
-        for h in self.get_queryset():
-            out[h.id] = list(h.completions.values_list("date", flat=True))
-        return Response(out)
+        habits = list(self.get_queryset())
+        dates = completion_dates(habits)
+        return Response({h.id: sorted(dates[h.id], reverse=True) for h in habits})
 
 
 # ==========================================================
@@ -268,21 +358,102 @@ class ReminderViewSet(viewsets.ModelViewSet):
         return Response({"is_active": reminder.is_active})
 
 
+# ==========================================================
+# STATS (weekly / monthly / yearly, read from DailyRollup)
+# ==========================================================
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def stats_view(request, period):
+    today = timezone.now().date()
+
+    try:
+        if period == "weekly":
+            end = date_cls.fromisoformat(request.query_params["end"]) if "end" in request.query_params else today
+            start = end - timedelta(days=6)
+        elif period == "monthly":
+            year = int(request.query_params.get("year", today.year))
+            month = int(request.query_params.get("month", today.month))
+            start = date_cls(year, month, 1)
+            end = date_cls(year, month, calendar.monthrange(year, month)[1])
+        else:
+            year = int(request.query_params.get("year", today.year))
+            start, end = date_cls(year, 1, 1), date_cls(year, 12, 31)
+    except ValueError:
+        return Response({"error": "Invalid date parameters"}, status=status.HTTP_400_BAD_REQUEST)
+
+    days = rollups.daily_series(request.user, start, end, today=today)
+
+    data = {
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "summary": rollups.summarize(days),
+    }
+    if period == "yearly":
+        data["months"] = rollups.monthly_buckets(days)
+    else:
+        data["days"] = days
+
+    return Response(data)
+
+
+# ==========================================================
+# HEATMAP (every habit's year as a packed bitset)
+# ==========================================================
+def _calendar_params(request):
+    """(year, encoding) from the query string, or None if invalid."""
+    try:
+        year = int(request.query_params.get("year", timezone.now().year))
+    except ValueError:
+        return None
+    encoding = request.query_params.get("encoding", "bytes")
+    if not 1 <= year <= 9998 or encoding not in calendars.ENCODINGS:
+        return None
+    return year, encoding
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def heatmap_view(request):
+    params = _calendar_params(request)
+    if params is None:
+        return Response({"error": "Invalid year or encoding"}, status=status.HTTP_400_BAD_REQUEST)
+    year, encoding = params
+
+    habits = list(Habit.objects.filter(user=request.user))
+    years = calendars.habit_years(habits, year)
+
+    return Response({
+        "year": year,
+        "encoding": encoding,
+        "habits": [
+            {
+                "id": h.id,
+                "name": h.name,
+                "bitset": calendars.encode(years[h.id][0], encoding),
+                "months": years[h.id][1],
+            }
+            for h in habits
+        ],
+        "months": [sum(years[h.id][1][m] for h in habits) for m in range(12)],
+        "days": calendars.day_counts([years[h.id][0] for h in habits], year),
+    })
+
+
 # ==========================================================
 # AI SUGGESTIONS
 # ==========================================================
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def ai_suggestions_view(request):
-    habits = Habit.objects.filter(user=request.user)
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
+    habits = list(Habit.objects.filter(user=request.user))
+    stats = compute_stats(habits)
 
     personalized = []
 
     for h in habits:
-        week_count = h.completions.filter(date__gte=week_ago).count()
-        rate = round(week_count / 7 * 100)
+        # target-aware: a Weekly habit done once this week is at 100%
+        rate = stats[h.id].consistency
 
         if rate == 100:
             personalized.append({
@@ -291,7 +462,7 @@ def ai_suggestions_view(request):
                 "icon": "award",
                 "category": "Celebration",
             })
-        elif rate == 0 and h.total_completions == 0:
+        elif rate == 0 and stats[h.id].total == 0:
             personalized.append({
                 "title": f'Start "{h.name}" today',
                 "description": "Start with 2 minutes only.",
@@ -325,3 +496,13 @@ def ai_suggestions_view(request):
         "personalized_tips": personalized[:4],
         "suggestions": base[:6]
     })
+
+
+# ==========================================================
+# DB POOL METRICS (staff only)
+# ==========================================================
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def db_pool_view(request):
+    # per worker process: each gunicorn worker reports its own pools
+    return Response({"pools": all_stats()})
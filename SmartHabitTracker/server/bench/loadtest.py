@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+Offline HTTP load driver for the API (stdlib only).
+
+Point it at `manage.py runserver` or gunicorn on localhost, with users created
+by `manage.py seed_load_data` (same --prefix / password). Each virtual user
+logs in once, then loops over a weighted session mix:
+
+    dashboard    GET habits + completions + weekly stats
+    toggle       POST toggle_completion (twice, so data ends where it started)
+    reminder     PATCH a reminder's message
+    suggestions  GET ai/suggestions
+
+For every concurrency level in --sweep it runs for --duration seconds and
+reports throughput plus p50/p95/p99 latency and error rate per endpoint.
+
+    python bench/loadtest.py --base http://127.0.0.1:8000 --sweep 1,4,16 --duration 20
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from urllib.parse import urlsplit
+
+MIX = {"dashboard": 50, "toggle": 20, "reminder": 10, "suggestions": 20}
+
+
+# ==========================================================
+# ONE VIRTUAL USER
+# ==========================================================
+class Session:
+    def __init__(self, base, email, password, record, rng):
+        url = urlsplit(base)
+        self.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        self.prefix = url.path.rstrip("/")
+        self.email = email
+        self.password = password
+        self.record = record
+        self.rng = rng
+        self.token = None
+        self.habits = []
+        self.reminders = []
+
+    def request(self, label, method, path, body=None):
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        payload = json.dumps(body).encode() if body is not None else None
+
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            raw = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnect on the next request
+            raw, status = b"", 0
+        self.record(label, (time.perf_counter() - started) * 1000, status)
+
+        if status and status < 400 and raw:
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return None
+        return None
+
+    def login(self):
+        data = self.request("login", "POST", "/api/login/", {"email": self.email, "password": self.password})
+        self.token = (data or {}).get("token")
+        if self.token:
+            self.habits = [h["id"] for h in self.request("habits", "GET", "/api/habits/") or []]
+            self.reminders = [r["id"] for r in self.request("reminders", "GET", "/api/reminders/") or []]
+        return bool(self.token)
+
+    # ---------- actions ----------
+    def dashboard(self):
+        self.request("habits", "GET", "/api/habits/")
+        self.request("completions", "GET", "/api/habits/completions/")
+        self.request("stats-weekly", "GET", "/api/stats/weekly/")
+
+    def toggle(self):
+        if not self.habits:
+            return
+        habit = self.rng.choice(self.habits)
+        body = {"date": date.today().isoformat()}
+        self.request("toggle", "POST", f"/api/habits/{habit}/toggle_completion/", body)
+        self.request("toggle", "POST", f"/api/habits/{habit}/toggle_completion/", body)
+
+    def reminder(self):
+        if not self.reminders:
+            return
+        reminder = self.rng.choice(self.reminders)
+        self.request("reminder-edit", "PATCH", f"/api/reminders/{reminder}/", {"message": "Time for your habit!"})
+
+    def suggestions(self):
+        self.request("suggestions", "GET", "/api/ai/suggestions/")
+
+
+# ==========================================================
+# ONE CONCURRENCY LEVEL
+# ==========================================================
+def run_level(args, concurrency):
+    samples = defaultdict(list)   # label -> [(ms, status)]
+    lock = threading.Lock()
+    stop = threading.Event()
+    actions, weights = zip(*MIX.items())
+
+    def record(label, ms, status):
+        if stop.is_set() and label != "login":
+            return
+        with lock:
+            samples[label].append((ms, status))
+
+    def virtual_user(n):
+        rng = random.Random(args.seed * 10007 + n)
+        user_no = n % args.user_count
+        session = Session(args.base, f"{args.prefix}-{user_no}@example.com", args.password, record, rng)
+        if not session.login():
+            return
+        while not stop.is_set():
+            getattr(session, rng.choices(actions, weights)[0])()
+            if args.think_ms:
+                time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+    threads = [threading.Thread(target=virtual_user, args=(n,), daemon=True) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=30)
+    elapsed = time.perf_counter() - started
+
+    return summarize(samples, elapsed, concurrency)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed, concurrency):
+    endpoints = {}
+    total = errors = 0
+    for label, rows in sorted(samples.items()):
+        latencies = sorted(ms for ms, _ in rows)
+        failed = sum(1 for _, status in rows if not status or status >= 400)
+        total += len(rows)
+        errors += failed
+        endpoints[label] = {
+            "requests": len(rows),
+            "rps": round(len(rows) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "error_rate": round(failed / len(rows), 4) if rows else 0.0,
+        }
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 1),
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def print_level(level):
+    print(f"\n== concurrency {level['concurrency']}: {level['requests']} requests, "
+          f"{level['rps']} req/s, {level['error_rate'] * 100:.2f}% errors")
+    print(f"   {'endpoint':<16}{'req':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err%':>8}")
+    for label, row in level["endpoints"].items():
+        print(f"   {label:<16}{row['requests']:>7}{row['rps']:>9.1f}{row['p50_ms']:>9.1f}"
+              f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['error_rate'] * 100:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="http://127.0.0.1:8000")
+    parser.add_argument("--sweep", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per level.")
+    parser.add_argument("--prefix", default="load", help="seed_load_data username prefix.")
+    parser.add_argument("--password", default="load-test-pass-123")
+    parser.add_argument("--user-count", type=int, default=50, help="How many seeded users to log in as.")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean think time between actions.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report here.")
+    args = parser.parse_args()
+
+    levels = []
+    for concurrency in [int(c) for c in args.sweep.split(",") if c.strip()]:
+        level = run_level(args, concurrency)
+        print_level(level)
+        levels.append(level)
+
+    print(f"\n{'concurrency':>12}{'req/s':>10}{'worst p95':>12}{'err%':>8}")
+    for level in levels:
+        worst_p95 = max((e["p95_ms"] for e in level["endpoints"].values()), default=0)
+        print(f"{level['concurrency']:>12}{level['rps']:>10.1f}{worst_p95:>12.1f}{level['error_rate'] * 100:>8.2f}")
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"base": args.base, "levels": levels}, fh, indent=2)
+
+    if levels and all(level["requests"] == 0 for level in levels):
+        print("No requests completed; is the server running and seeded?", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
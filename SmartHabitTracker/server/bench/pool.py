@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Connection pooling benchmark.
+
+Spawns one interpreter per mode, pushes --requests authenticated GETs through
+the WSGI app from --threads threads, and reports latency percentiles, how many
+physical DB connections were opened, and the pool's wait/churn counters:
+
+  * no-pool     DB_POOL=0, CONN_MAX_AGE=0  (connect + close on every request)
+  * persistent  DB_POOL=0, CONN_MAX_AGE=60 (one connection per thread)
+  * pool        DB_POOL=1, CONN_MAX_AGE=0  (borrow from a bounded pool)
+
+Uses whatever database the environment points at (DB_ENGINE, DB_NAME, ...),
+seeded with `manage.py seed_load_data`. The connect cost is what pooling
+saves, so numbers against a networked MySQL are the meaningful ones; SQLite
+only shows the overhead side.
+
+    python bench/pool.py --requests 2000 --threads 8 --out pool.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import io, json, os, sys, threading, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+from config.wsgi import application
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.authtoken.models import Token
+from config.db.pool import all_stats
+
+path, prefix, total, threads = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+user = User.objects.filter(username__startswith=prefix + "-").order_by("id").first()
+if user is None:
+    sys.exit(f"no '{prefix}-' users; run manage.py seed_load_data")
+token = Token.objects.get_or_create(user=user)[0].key
+connections.close_all()
+
+# connection_created also fires when Django "connects" to a pooled connection,
+# so physical connects are read from the pool's own counter when it is on
+opened = []
+connection_created.connect(lambda **kw: opened.append(1), weak=False)
+
+def physical_connects():
+    pool = next((p for p in all_stats() if p["alias"] == "default"), None)
+    return pool["created"] if pool else len(opened)
+
+def call():
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+        "HTTP_AUTHORIZATION": "Token " + token,
+        "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.version": (1, 0), "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    status = []
+    body = application(environ, lambda s, h, e=None: status.append(s))
+    try:
+        b"".join(body)
+    finally:
+        body.close()  # fires request_finished, which hands the connection back
+    return status[0]
+
+latencies, errors = [], []
+lock = threading.Lock()
+
+def worker(n):
+    mine, bad = [], 0
+    for _ in range(n):
+        started = time.perf_counter()
+        if not call().startswith("200"):
+            bad += 1
+        mine.append((time.perf_counter() - started) * 1000)
+    with lock:
+        latencies.extend(mine)
+        errors.append(bad)
+
+call()  # imports and first connection
+before = physical_connects()
+started = time.perf_counter()
+pool = [threading.Thread(target=worker, args=(total // threads,)) for _ in range(threads)]
+for t in pool:
+    t.start()
+for t in pool:
+    t.join()
+elapsed = time.perf_counter() - started
+
+print(json.dumps({
+    "latencies": latencies,
+    "errors": sum(errors),
+    "seconds": elapsed,
+    "connections_opened": physical_connects() - before,
+    "pools": all_stats(),
+}))
+"""
+
+MODES = {
+    "no-pool": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "1", "DB_CONN_MAX_AGE": "0"},
+}
+
+
+def run_mode(name, args):
+    env = {**os.environ, **MODES[name], "DJANGO_WARMUP": "False"}
+    if args.pool_size:
+        env["DB_POOL_MAX_SIZE"] = str(args.pool_size)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, args.path, args.prefix, str(args.requests), str(args.threads)],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+    )
+    if out.returncode:
+        sys.exit(f"{name} probe failed:\n{out.stderr}")
+    raw = json.loads(out.stdout.strip().splitlines()[-1])
+
+    latencies = sorted(raw["latencies"])
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    pool = next((p for p in raw["pools"] if p["alias"] == "default"), None)
+    return {
+        "requests": len(latencies),
+        "errors": raw["errors"],
+        "rps": round(len(latencies) / raw["seconds"], 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(pct(0.95), 3),
+        "p99_ms": round(pct(0.99), 3),
+        "connections_opened": raw["connections_opened"],
+        "pool": pool,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/habits/")
+    parser.add_argument("--prefix", default="load", help="seed_load_data username prefix.")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, help="DB_POOL_MAX_SIZE for the pool mode.")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--out", help="Write the JSON report here.")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'mode':<12}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'conns':>7}{'waits':>7}{'wait s':>8}{'err':>5}")
+    for name in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        r = results[name] = run_mode(name, args)
+        pool = r["pool"] or {}
+        print(f"{name:<12}{r['rps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['connections_opened']:>7d}{pool.get('waits', 0):>7d}{pool.get('wait_seconds', 0):>8.2f}"
+              f"{r['errors']:>5d}")
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump({"path": args.path, "threads": args.threads, "modes": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Cold-start benchmark for config/wsgi.py.
+
+Spawns fresh interpreters and measures, per configuration:
+  * import_ms         importing config.wsgi (includes warm-up when enabled)
+  * first_ms          the first request through the WSGI app
+  * second_ms         a second request (the warm baseline)
+  * spawn_to_first_ms wall time from process spawn to first response
+and lists the slowest imports from `python -X importtime`.
+
+Configurations compared: "cold" (DJANGO_WARMUP=False, the old behaviour),
+"warm" (warm-up on), and "warm-no-admin" (warm-up on, ADMIN_ENABLED=False).
+
+Run from the server directory:
+
+    python bench/startup.py --runs 5 --out before.json
+    python bench/startup.py --runs 5 --compare before.json --budget-ms 600
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import io, json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+from config.wsgi import application
+t1 = time.perf_counter()
+
+def call(path):
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+        "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.version": (1, 0), "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False, "wsgi.multiprocess": True, "wsgi.run_once": False,
+    }
+    status = []
+    b"".join(application(environ, lambda s, h, e=None: status.append(s)))
+    return status[0]
+
+status = call(sys.argv[1])
+t2 = time.perf_counter()
+call(sys.argv[1])
+t3 = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (t1 - t0) * 1000,
+    "first_ms": (t2 - t1) * 1000,
+    "second_ms": (t3 - t2) * 1000,
+}))
+"""
+
+CONFIGS = {
+    "cold": {"DJANGO_WARMUP": "False", "ADMIN_ENABLED": "True"},
+    "warm": {"DJANGO_WARMUP": "True", "ADMIN_ENABLED": "True"},
+    "warm-no-admin": {"DJANGO_WARMUP": "True", "ADMIN_ENABLED": "False"},
+}
+
+
+def run_probe(env, path):
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["spawn_to_first_ms"] = (time.perf_counter() - started) * 1000 - result["second_ms"]
+    return result
+
+
+def import_profile(env, top):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import config.wsgi"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    per_package = {}
+    total = 0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = [p.strip() for p in line.replace("import time:", "|").split("|")]
+        package = name.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + int(self_us)
+        total += int(self_us)
+
+    ranked = sorted(per_package.items(), key=lambda kv: -kv[1])[:top]
+    return {"total_ms": total / 1000, "top_packages_ms": {k: v / 1000 for k, v in ranked}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/habits/", help="Request path for the first response.")
+    parser.add_argument("--settings", default=os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"))
+    parser.add_argument("--top", type=int, default=12, help="Packages to list from -X importtime.")
+    parser.add_argument("--out", help="Write the JSON report here.")
+    parser.add_argument("--compare", help="Previous JSON report to diff against.")
+    parser.add_argument("--budget-ms", type=float,
+                        help="Exit non-zero if warm spawn_to_first_ms exceeds this budget.")
+    args = parser.parse_args()
+
+    envs = {
+        name: {**os.environ, "DJANGO_SETTINGS_MODULE": args.settings, **overrides}
+        for name, overrides in CONFIGS.items()
+    }
+
+    # interleave configurations so machine noise hits all of them alike
+    samples = {name: [] for name in CONFIGS}
+    for _ in range(args.runs):
+        for name, env in envs.items():
+            samples[name].append(run_probe(env, args.path))
+
+    report = {}
+    for name, runs in samples.items():
+        env = envs[name]
+        report[name] = {
+            key: round(statistics.median(r[key] for r in runs), 1)
+            for key in ("import_ms", "first_ms", "second_ms", "spawn_to_first_ms")
+        }
+        report[name]["status"] = runs[-1]["status"]
+        report[name]["imports"] = import_profile(env, args.top)
+
+    previous = json.load(open(args.compare)) if args.compare else {}
+
+    print(f"{'config':<15}{'import':>10}{'first':>10}{'second':>10}{'spawn->1st':>12}")
+    for name, row in report.items():
+        line = f"{name:<15}" + "".join(
+            f"{row[k]:>10.1f}" for k in ("import_ms", "first_ms", "second_ms")
+        ) + f"{row['spawn_to_first_ms']:>12.1f}"
+        if name in previous:
+            delta = row["spawn_to_first_ms"] - previous[name]["spawn_to_first_ms"]
+            line += f"  ({delta:+.1f}ms vs previous)"
+        print(line)
+
+    print("\nSlowest packages at import (self time, warm config):")
+    for package, ms in report["warm"]["imports"]["top_packages_ms"].items():
+        print(f"  {package:<24}{ms:>8.1f}ms")
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    if args.budget_ms and report["warm"]["spawn_to_first_ms"] > args.budget_ms:
+        print(f"\nOver budget: {report['warm']['spawn_to_first_ms']:.1f}ms > {args.budget_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ENABLED:
+    from django.core.wsgi import get_wsgi_application
+    from config.warmup import warm_up
+    # same middleware/view stack, driven through a WSGI handler at boot
+    warm_up(get_wsgi_application())
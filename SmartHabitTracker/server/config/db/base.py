@@ -0,0 +1,45 @@
+"""
+Mixin that makes a Django DatabaseWrapper borrow its DB-API connection from
+config.db.pool instead of opening and closing one per request.
+
+Django still runs its own lifecycle (CONN_MAX_AGE, CONN_HEALTH_CHECKS,
+close_old_connections at request boundaries); only the physical
+connect/close is swapped for acquire/release.
+"""
+from .pool import get_pool
+
+
+class PooledDatabaseWrapperMixin:
+    def _pool_enabled(self):
+        return True
+
+    def get_new_connection(self, conn_params):
+        if not self._pool_enabled():
+            return super().get_new_connection(conn_params)
+        pool = get_pool(self.alias, self.settings_dict)
+        return pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+                            self._ping)
+
+    def _ping(self, raw):
+        cursor = raw.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _close(self):
+        if self.connection is None or not self._pool_enabled():
+            return super()._close()
+        get_pool(self.alias, self.settings_dict).release(self.connection, self._reusable())
+
+    def _reusable(self):
+        # never hand an open transaction or a changed session to the next borrower
+        if self.in_atomic_block or self.needs_rollback:
+            return False
+        try:
+            if self.get_autocommit() != self.settings_dict["AUTOCOMMIT"]:
+                return False
+        except Exception:
+            return False
+        return not self.errors_occurred or self.is_usable()
@@ -0,0 +1,210 @@
+"""
+Bounded, per-process pool of raw DB-API connections.
+
+Django keeps one connection per thread and, with CONN_MAX_AGE=0, opens and
+closes it on every request. The pooled backends in config/db/ route that
+open/close through a ConnectionPool instead, so a request normally just
+borrows an already-authenticated connection:
+
+* at most MAX_SIZE connections per process (per DB alias); extra borrowers
+  wait up to TIMEOUT seconds,
+* idle connections are pinged before reuse when idle for longer than
+  HEALTH_CHECK_AFTER seconds, and recycled after MAX_LIFETIME seconds,
+* pools notice a fork (gunicorn --preload, ProcessPoolExecutor) and start
+  empty in the child rather than sharing the parent's sockets.
+
+The pool is thread-safe, so WSGI thread workers and the ASGI sync-to-async
+thread pool share the same bounded set of connections.
+"""
+import os
+import threading
+import time
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'HEALTH_CHECK_AFTER': 30,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, alias, max_size, timeout, max_lifetime, health_check_after):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self._idle = []        # [(conn, created_at, returned_at)], used LIFO
+        self._born = {}        # id(conn) -> created_at for connections in use
+        self._size = 0
+        self._orphans = []     # parent's connections after a fork; never touched
+        self.metrics = {
+            'created': 0, 'reused': 0, 'closed': 0, 'failed_checks': 0,
+            'waits': 0, 'wait_seconds': 0.0, 'timeouts': 0,
+        }
+
+    def _check_fork(self):
+        if os.getpid() != self.pid:
+            # keep references so GC doesn't close sockets the parent still uses
+            orphans = self._orphans + [conn for conn, _, _ in self._idle]
+            self._reset()
+            self._orphans = orphans
+
+    # ---------- borrowing ----------
+    def acquire(self, connect, ping):
+        """Return a raw connection, reusing an idle one or calling connect()."""
+        deadline = None
+        while True:
+            with self._cond:
+                self._check_fork()
+                conn = self._take_idle()
+                if conn is None:
+                    if self._size < self.max_size:
+                        self._size += 1  # reserve a slot, connect below
+                        break
+                    deadline = self._wait(deadline)
+                    continue
+
+            # ping outside the lock so one dead socket doesn't stall every borrower
+            conn, born, returned = conn
+            if time.monotonic() - returned > self.health_check_after and not self._ping(ping, conn):
+                with self._cond:
+                    self.metrics['failed_checks'] += 1
+                    self._discard(conn)
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._born[id(conn)] = born
+                self.metrics['reused'] += 1
+            return conn
+
+        try:
+            conn = connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._born[id(conn)] = time.monotonic()
+            self.metrics['created'] += 1
+        return conn
+
+    def _take_idle(self):
+        while self._idle:
+            conn, born, returned = self._idle.pop()
+            if time.monotonic() - born > self.max_lifetime:
+                self._discard(conn)
+                continue
+            return conn, born, returned
+        return None
+
+    def _wait(self, deadline):
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+            self.metrics['waits'] += 1
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.metrics['timeouts'] += 1
+            raise PoolTimeout(
+                f"No free '{self.alias}' connection after {self.timeout}s "
+                f"(pool size {self.max_size})"
+            )
+        started = time.monotonic()
+        self._cond.wait(remaining)
+        self.metrics['wait_seconds'] += time.monotonic() - started
+        return deadline
+
+    def release(self, conn, reusable=True):
+        with self._cond:
+            if os.getpid() != self.pid:
+                return  # borrowed before a fork; not ours to pool or close
+            born = self._born.pop(id(conn), None)
+            if born is None:
+                self._close(conn)
+                return
+            if reusable and time.monotonic() - born <= self.max_lifetime:
+                self._idle.append((conn, born, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    # ---------- internals (called with the lock held) ----------
+    def _discard(self, conn):
+        self._size -= 1
+        self._close(conn)
+
+    def _close(self, conn):
+        self.metrics['closed'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _ping(self, ping, conn):
+        try:
+            ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def stats(self):
+        with self._cond:
+            return {
+                'alias': self.alias,
+                'pid': self.pid,
+                'max_size': self.max_size,
+                'open': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **self.metrics,
+            }
+
+
+def get_pool(alias, settings_dict):
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            options = {**DEFAULTS, **settings_dict.get('POOL', {})}
+            pool = _pools[alias] = ConnectionPool(
+                alias,
+                max_size=int(options['MAX_SIZE']),
+                timeout=float(options['TIMEOUT']),
+                max_lifetime=float(options['MAX_LIFETIME']),
+                health_check_after=float(options['HEALTH_CHECK_AFTER']),
+            )
+        return pool
+
+
+def all_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_idle():
+    """Close every idle pooled connection (e.g. before forking workers)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        with pool._cond:
+            pool._check_fork()
+            while pool._idle:
+                conn, _, _ = pool._idle.pop()
+                pool._discard(conn)
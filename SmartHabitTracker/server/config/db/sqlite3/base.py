@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from ..base import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def _pool_enabled(self):
+        # closing an in-memory database destroys it, and Django's own close()
+        # already keeps those open, so only file databases are pooled
+        return not self.is_in_memory_db()
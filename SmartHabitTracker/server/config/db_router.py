@@ -0,0 +1,163 @@
+"""
+Primary / replica database routing.
+
+* Writes always go to "default" (the primary).
+* Reads go to a healthy replica from settings.DATABASE_REPLICAS, but only
+  while serving a safe (GET/HEAD/OPTIONS) request. Management commands,
+  background jobs and anything inside a transaction read from the primary.
+* Read-your-writes: once a client writes, that client (identified by its
+  token, or session cookie) is pinned to the primary for
+  settings.DB_PIN_SECONDS, so the next dashboard load sees its own toggle.
+  Register and login hand out a token the request itself did not carry, so
+  they pin that token with pin_client(). Pins live in the default cache,
+  which settings.CACHES shares between workers; its table (for the
+  database backend) is always read from the primary. Pinning is best
+  effort: if the cache is unreachable the request is served without it.
+* A replica that fails to connect is skipped for DB_REPLICA_RETRY_SECONDS,
+  and reads fall back to the next replica or the primary.
+"""
+import contextvars
+import hashlib
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# app_label of DatabaseCache's table model
+CACHE_APP_LABEL = "django_cache"
+
+# per-request routing state: None outside a request (-> primary)
+_request = contextvars.ContextVar("db_routing_request", default=None)
+
+# alias -> monotonic time until which the replica is considered down
+_down_until = {}
+
+
+def _pin_cache_key(client):
+    return f"db-pin:{client}"
+
+
+def _hash(raw):
+    # never keep raw credentials as cache keys
+    return hashlib.sha256(raw.encode()).hexdigest()[:32] if raw else None
+
+
+def _client_key(request):
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if auth.startswith("Token "):
+        return _hash(auth[6:].strip())
+    return _hash(request.COOKIES.get(settings.SESSION_COOKIE_NAME, ""))
+
+
+def pin_to_primary():
+    """Force the rest of this request (and the client's next few) onto the primary."""
+    state = _request.get()
+    if state is not None:
+        state["pinned"] = True
+        state["wrote"] = True
+
+
+def pin_client(token):
+    """Pin the client that will authenticate with `token` (just issued to it) after this request."""
+    state = _request.get()
+    if state is not None:
+        state["client"] = _hash(token)
+        state["wrote"] = True
+
+
+def _is_pinned(client):
+    try:
+        return bool(cache.get(_pin_cache_key(client)))
+    except Exception as exc:  # a broken cache must not take every request down with it
+        logger.warning("Read-your-writes pin lookup failed (%s); reading as unpinned", exc)
+        return False
+
+
+def _pin(client):
+    try:
+        cache.set(_pin_cache_key(client), 1, settings.DB_PIN_SECONDS)
+    except Exception as exc:
+        logger.warning("Read-your-writes pin not stored (%s)", exc)
+
+
+# ==========================================================
+# MIDDLEWARE
+# ==========================================================
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        client = _client_key(request)
+        unsafe = request.method not in SAFE_METHODS
+
+        state = {
+            "pinned": unsafe or bool(client and _is_pinned(client)),
+            "wrote": unsafe,
+        }
+        token = _request.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+            client = state.get("client") or client
+            if state["wrote"] and client:
+                _pin(client)
+
+
+# ==========================================================
+# ROUTER
+# ==========================================================
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if state is None or state["pinned"] or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label == CACHE_APP_LABEL:
+            # a lagging replica would miss the pin that sent us to the primary
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        # stick to one replica per request so reads see a single snapshot
+        if state.get("replica"):
+            return state["replica"]
+
+        replicas = list(settings.DATABASE_REPLICAS)
+        random.shuffle(replicas)
+        state["replica"] = next((a for a in replicas if self._healthy(a)), DEFAULT_DB_ALIAS)
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        # a cache write (a GET filling the cache) is not a write the client would read back
+        if model._meta.app_label != CACHE_APP_LABEL:
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their schema from replication, not from migrate
+        return db == DEFAULT_DB_ALIAS
+
+    def _healthy(self, alias):
+        if _down_until.get(alias, 0) > time.monotonic():
+            return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as exc:
+            logger.warning("Replica %s unavailable (%s); reading from primary", alias, exc)
+            _down_until[alias] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+            return False
+        return True
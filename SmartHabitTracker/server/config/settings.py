@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # ----------------------------------------
@@ -16,11 +18,16 @@ ALLOWED_HOSTS = [
     "127.0.0.1",
 ]
 
+# Admin costs ~80ms of cold start; API-only instances can switch it off
+ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', 'True').lower() == 'true'
+
+# Run config.warmup before the worker accepts traffic (see config/wsgi.py)
+WARMUP_ENABLED = os.environ.get('DJANGO_WARMUP', 'True').lower() == 'true'
+
 # ----------------------------------------
 # APPS
 # ----------------------------------------
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -36,11 +43,15 @@ INSTALLED_APPS = [
     'api',
 ]
 
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 # ----------------------------------------
 # MIDDLEWARE
 # ----------------------------------------
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'config.db_router.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,20 +84,133 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # ----------------------------------------
 # DATABASE
 # ----------------------------------------
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': os.getenv('DB_NAME'),
-        'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT'),
-        'OPTIONS': {
-            'charset': 'utf8mb4',
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+# DB_ENGINE=sqlite runs against local files instead of MySQL (DB_NAME is the
+# primary file, DB_REPLICA_NAMES a comma-separated list of replica files).
+DB_ENGINE = os.getenv('DB_ENGINE', 'mysql')
+
+# DB_POOL=1 (opt-in) swaps in the pooled backends from config/db/: each
+# process keeps up to DB_POOL_MAX_SIZE open connections per alias and
+# requests borrow one instead of reconnecting. With the pool on, Django
+# hands the connection back after every request (CONN_MAX_AGE=0); with it
+# off, Django keeps one persistent connection per thread instead.
+DB_POOL = os.getenv('DB_POOL', '0') == '1'
+DB_BACKEND = 'config.db.{}' if DB_POOL else 'django.db.backends.{}'
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_BACKEND.format('sqlite3'),
+            'NAME': os.getenv('DB_NAME') or BASE_DIR / 'db.sqlite3',
         }
     }
-}
+    REPLICA_OVERRIDES = [
+        # read-only URI: a missing replica file is an error, not a new empty DB
+        {'NAME': f'file:{name.strip()}?mode=ro'}
+        for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name.strip()
+    ]
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_BACKEND.format('mysql'),
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT'),
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+            }
+        }
+    }
+    # DB_REPLICA_HOSTS=replica1:3306,replica2 (same name/user/password as primary)
+    REPLICA_OVERRIDES = [
+        dict(zip(('HOST', 'PORT'), host.strip().split(':', 1)))
+        for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()
+    ]
+
+DATABASES['default'].update({
+    'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0' if DB_POOL else '60')),
+    'CONN_HEALTH_CHECKS': True,
+    'POOL': {
+        'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'HEALTH_CHECK_AFTER': int(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '30')),
+    },
+})
+
+DATABASE_REPLICAS = []
+for n, overrides in enumerate(REPLICA_OVERRIDES, 1):
+    alias = f'replica{n}'
+    DATABASES[alias] = {**DATABASES['default'], **overrides, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['config.db_router.PrimaryReplicaRouter']
+
+# read-your-writes window and how long a failed replica is skipped
+DB_PIN_SECONDS = int(os.getenv('DB_PIN_SECONDS', '5'))
+DB_REPLICA_RETRY_SECONDS = int(os.getenv('DB_REPLICA_RETRY_SECONDS', '30'))
+
+# ----------------------------------------
+# CACHE
+# ----------------------------------------
+# Read-your-writes pins (config/db_router.py) must be seen by every
+# worker, so the default cache is shared between processes: Redis when
+# REDIS_URL is set (needs the `redis` package), otherwise a table in the
+# primary database (created by `migrate`, see api/migrations/0010 and 0012).
+#
+# Calendar bitsets (api/calendars.py) get their own alias so they never
+# evict pins. Their keys carry Habit.updated_at, so a per-process copy can
+# never serve a stale calendar; without Redis they stay in local memory.
+#
+# Idempotency keys (api/idempotency.py) must be shared too, and must not be
+# culled before IDEMPOTENCY_TTL_SECONDS: without Redis they get a table of
+# their own, sized for a TTL's worth of retried POSTs.
+REDIS_URL = os.getenv('REDIS_URL')
+CALENDAR_CACHE_MAX_ENTRIES = int(os.getenv('CALENDAR_CACHE_MAX_ENTRIES', '10000'))
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_CACHE_MAX_ENTRIES', '100000'))
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'calendars': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'calendars',
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'idempotency',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.getenv('CACHE_TABLE', 'django_cache'),
+        },
+        'calendars': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'calendars',
+            'OPTIONS': {'MAX_ENTRIES': CALENDAR_CACHE_MAX_ENTRIES},
+        },
+        'idempotency': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.getenv('IDEMPOTENCY_CACHE_TABLE', 'django_cache_idempotency'),
+            'OPTIONS': {'MAX_ENTRIES': IDEMPOTENCY_CACHE_MAX_ENTRIES},
+        },
+    }
+
+# completions older than this (rounded down to Jan 1) move to the archive
+# tier when `manage.py archive_completions` runs
+COMPLETION_HOT_DAYS = int(os.getenv('COMPLETION_HOT_DAYS', '365'))
+
+# calendar / heatmap bitsets are cached per habit-year, keyed by Habit.updated_at
+CALENDAR_CACHE_SECONDS = int(os.getenv('CALENDAR_CACHE_SECONDS', str(24 * 3600)))
 
 # ----------------------------------------
 # PASSWORD VALIDATION
@@ -130,6 +254,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ----------------------------------------
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
+# how long a response is replayed for a repeated Idempotency-Key
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '600'))
+
+# ----------------------------------------
+# EMAIL + REMINDER NOTIFICATIONS
+# ----------------------------------------
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '0') == '1'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'reminders@smarthabittracker.local')
+
+# `manage.py send_notifications`: messages per SMTP session / webhook POST,
+# open sessions per SMTP relay or webhook host, and retry policy
+NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', '100'))
+NOTIFY_MAX_PER_DESTINATION = int(os.getenv('NOTIFY_MAX_PER_DESTINATION', '4'))
+NOTIFY_TIMEOUT_SECONDS = float(os.getenv('NOTIFY_TIMEOUT_SECONDS', '10'))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '5'))
+NOTIFY_BACKOFF_SECONDS = float(os.getenv('NOTIFY_BACKOFF_SECONDS', '30'))
+# reminders due this far back are still sent (covers worker restarts; keep under a day)
+NOTIFY_LOOKBACK_MINUTES = int(os.getenv('NOTIFY_LOOKBACK_MINUTES', '15'))
+# 'sending' rows older than this belonged to a worker that died
+NOTIFY_STALE_SECONDS = int(os.getenv('NOTIFY_STALE_SECONDS', '300'))
+# sent / failed rows are kept this long for the delivery log
+NOTIFY_RETENTION_DAYS = int(os.getenv('NOTIFY_RETENTION_DAYS', '30'))
+# webhooks to loopback / private / link-local addresses are refused unless
+# this is on (local sinks in tests and bench_notifications)
+NOTIFY_ALLOW_PRIVATE_WEBHOOKS = os.getenv('NOTIFY_ALLOW_PRIVATE_WEBHOOKS', '0') == '1'
 
 # ----------------------------------------
 # DRF SETTINGS
@@ -0,0 +1,82 @@
+"""
+Pay the first-request costs at boot, before the worker accepts traffic.
+
+A fresh worker otherwise spends its first request importing the URLconf
+(views, serializers, most of DRF), loading the password validator lists,
+opening the DB connection and compiling the first queries. Warm-up does all
+of that up front, then closes the connection again so nothing is shared if
+the app is loaded before forking (e.g. gunicorn --preload).
+"""
+import io
+import logging
+import sys
+import time
+
+from django.db import connections
+
+from config.db.pool import close_idle
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PATH = '/api/habits/'
+
+
+def _fake_request(application, path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+    body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        b''.join(body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status[0] if status else None
+
+
+def warm_up(application):
+    started = time.perf_counter()
+
+    try:
+        from django.urls import get_resolver
+        from django.contrib.auth.password_validation import get_default_password_validators
+        from rest_framework.authtoken.models import Token
+        from api.models import Habit
+
+        # URLconf -> api.views, api.serializers and the DRF stack
+        get_resolver().resolve(WARMUP_PATH)
+
+        # CommonPasswordValidator reads its gzipped list on first use
+        get_default_password_validators()
+
+        # first connection + the queries every authenticated request makes
+        Token.objects.select_related('user').filter(key='').first()
+        Habit.objects.only('id').first()
+
+        # run the middleware / DRF / renderer path once (anonymous -> 401)
+        status = _fake_request(application, WARMUP_PATH)
+    except Exception:
+        # a cold DB must not stop the worker from booting
+        logger.warning('Warm-up failed; continuing cold', exc_info=True)
+        return
+    finally:
+        connections.close_all()
+        # close_all() only returns pooled connections to the pool
+        close_idle()
+
+    logger.info('Warm-up finished in %.0fms (%s %s)',
+                (time.perf_counter() - started) * 1000, WARMUP_PATH, status)
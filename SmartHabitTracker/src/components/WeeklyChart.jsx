@@ -1,38 +1,39 @@
-import { useMemo } from 'react'
+import { useEffect, useState } from 'react'
 import { Calendar, TrendingUp } from 'lucide-react'
 
-export default function WeeklyChart({ completions = {}, habits = [] }) {
-  const weekData = useMemo(() => {
-    const days = []
-    const today = new Date()
-
-    for (let i = 6; i >= 0; i--) {
-      const date = new Date(today)
-      date.setDate(date.getDate() - i)
-      const dateStr = date.toISOString().split('T')[0]
+import { statsApi } from '../utils/api'
 
-      let completedCount = 0
-      Object.values(completions).forEach(habitCompletions => {
-        if ((habitCompletions || []).includes(dateStr)) {
-          completedCount++
-        }
-      })
+// the last 7 days from the server's daily rollups (GET /api/stats/weekly/);
+// `completions` and `habits` only tell us when to refetch after a toggle
+const toDay = (d) => {
+  const date = new Date(`${d.date}T00:00:00`)
+  return {
+    date: d.date,
+    day: date.toLocaleDateString('en-US', { weekday: 'short' }),
+    dayNum: date.getDate(),
+    completed: d.completed,
+    total: d.active_habits || 1,
+    percentage: d.percentage,
+  }
+}
 
-      const percentage = habits.length > 0 ? Math.round((completedCount / habits.length) * 100) : 0
+export default function WeeklyChart({ completions = {}, habits = [] }) {
+  const [weekData, setWeekData] = useState([])
 
-      days.push({
-        date: dateStr,
-        day: date.toLocaleDateString('en-US', { weekday: 'short' }),
-        dayNum: date.getDate(),
-        completed: completedCount,
-        total: habits.length || 1,
-        percentage
+  useEffect(() => {
+    let cancelled = false
+    statsApi.weekly()
+      .then((data) => {
+        if (!cancelled) setWeekData((data?.days || []).map(toDay))
       })
-    }
-
-    return days
+      .catch((error) => console.error('Weekly stats failed:', error))
+    return () => { cancelled = true }
   }, [completions, habits])
 
+  if (!weekData.length) {
+    return <div className="bg-surface-dark rounded-3xl p-6 card-shadow h-72" />
+  }
+
   const maxCompleted = Math.max(...weekData.map(d => d.completed), 1)
   const weeklyAvg = Math.round(weekData.reduce((sum, d) => sum + d.percentage, 0) / 7)
   const bestDay = weekData.reduce((best, d) => d.percentage > best.percentage ? d : best, weekData[0])
@@ -65,6 +65,8 @@ export const authApi = {
     const formData = new FormData();
     if (data.name) formData.append("name", data.name);
     if (data.email) formData.append("email", data.email);
+    // "" turns webhook reminders off
+    if (data.webhook_url !== undefined) formData.append("webhook_url", data.webhook_url);
 
     const res = await fetch(`${BASE_URL}/profile/`, {
       method: "PATCH",
@@ -89,6 +91,15 @@ export const authApi = {
     return res.json();
   },
 
+  // DELETE ACCOUNT (server purges the data in the background)
+  deleteAccount: async () => {
+    const res = await fetch(`${BASE_URL}/profile/`, {
+      method: "DELETE",
+      headers: authHeader(),
+    });
+    return res.ok;
+  },
+
   // LOGOUT
   logout: () => {
     localStorage.removeItem("token");
@@ -104,8 +115,12 @@ export const authApi = {
 // HABIT API
 // ====================================================
 export const habitApi = {
-  getAll: async () => {
-    const res = await fetch(`${BASE_URL}/habits/`, {
+  // params: { category, difficulty, target, search, ordering } (all optional)
+  getAll: async (params = {}) => {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== undefined && value !== "")
+    ).toString();
+    const res = await fetch(`${BASE_URL}/habits/${query ? `?${query}` : ""}`, {
       headers: authHeader(),
     });
     return res.json();
@@ -152,6 +167,28 @@ export const habitApi = {
     return res.json();
   },
 
+  // set (not flip) today's state. `key` is the Idempotency-Key: the caller
+  // makes one per change (e.g. crypto.randomUUID()) and passes the same one
+  // on every retry, so a repeated request replays the first response
+  setCompletion: async (id, completed, key) => {
+    const today = new Date().toISOString().split("T")[0];
+
+    const res = await fetch(
+      `${BASE_URL}/habits/${id}/toggle_completion/`,
+      {
+        method: "POST",
+        headers: {
+          ...authHeader(),
+          "Content-Type": "application/json",
+          "Idempotency-Key": key,
+        },
+        body: JSON.stringify({ date: today, completed }),
+      }
+    );
+
+    return res.json();
+  },
+
   getAllCompletions: async () => {
     const res = await fetch(`${BASE_URL}/habits/completions/`, {
       headers: authHeader(),
@@ -198,6 +235,49 @@ export const reminderApi = {
   },
 };
 
+// ====================================================
+// STATS (daily rollups)
+// ====================================================
+export const statsApi = {
+  weekly: async () => {
+    const res = await fetch(`${BASE_URL}/stats/weekly/`, {
+      headers: authHeader(),
+    });
+    return res.json();
+  },
+
+  monthly: async (year, month) => {
+    const res = await fetch(`${BASE_URL}/stats/monthly/?year=${year}&month=${month}`, {
+      headers: authHeader(),
+    });
+    return res.json();
+  },
+
+  yearly: async (year) => {
+    const res = await fetch(`${BASE_URL}/stats/yearly/?year=${year}`, {
+      headers: authHeader(),
+    });
+    return res.json();
+  },
+
+  // packed bitsets: bit n of the year == day n (Jan 1 = 0), see isDone()
+  calendar: async (habitId, year) => {
+    const res = await fetch(`${BASE_URL}/habits/${habitId}/calendar/?year=${year}`, {
+      headers: authHeader(),
+    });
+    return res.json();
+  },
+
+  heatmap: async (year) => {
+    const res = await fetch(`${BASE_URL}/heatmap/?year=${year}`, {
+      headers: authHeader(),
+    });
+    return res.json();
+  },
+
+  isDone: (bitset, dayOfYear) => Boolean(bitset[dayOfYear >> 3] & (1 << (dayOfYear & 7))),
+};
+
 // ====================================================
 // AI SUGGESTIONS
 // ====================================================